@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Alert, AlertSettings
+from .models import Alert, AlertDelivery, AlertSettings
 
 # Register your models here.
 
@@ -9,19 +9,63 @@ from .models import Alert, AlertSettings
 class AlertAdmin(admin.ModelAdmin):
     list_display = ("title", "event", "timestamp", "is_active")
     list_filter = ("is_active", "event")
+    list_select_related = ("event",)
     search_fields = ("title", "description")
+    autocomplete_fields = ("event", "students", "opted_out_students")
     date_hierarchy = "timestamp"
     actions = ["activate", "deactivate"]
 
+    @admin.action(description="Activate selected alerts")
+    def activate(self, request, queryset):
+        updated = queryset.activate()
+        self.message_user(request, f"{updated} alerts activated")
+
+    @admin.action(description="Deactivate selected alerts")
+    def deactivate(self, request, queryset):
+        updated = queryset.deactivate()
+        self.message_user(request, f"{updated} alerts deactivated")
+
 
 @admin.register(AlertSettings)
 class AlertSettingsAdmin(admin.ModelAdmin):
     list_display = ("student", "via_email", "via_sms")
     list_filter = ("via_email", "via_sms")
-    search_fields = ("student__email",)
+    list_select_related = ("student",)
+    search_fields = ("student__email", "student__matric_number")
+    autocomplete_fields = ("student",)
     actions = [
         "enable_email_alerts",
         "disable_email_alerts",
         "enable_sms_alerts",
         "disable_sms_alerts",
     ]
+
+    @admin.action(description="Enable email alerts for selected students")
+    def enable_email_alerts(self, request, queryset):
+        updated = queryset.update(via_email=True)
+        self.message_user(request, f"Email alerts enabled for {updated} students")
+
+    @admin.action(description="Disable email alerts for selected students")
+    def disable_email_alerts(self, request, queryset):
+        updated = queryset.update(via_email=False)
+        self.message_user(request, f"Email alerts disabled for {updated} students")
+
+    @admin.action(description="Enable SMS alerts for selected students")
+    def enable_sms_alerts(self, request, queryset):
+        updated = queryset.update(via_sms=True)
+        self.message_user(request, f"SMS alerts enabled for {updated} students")
+
+    @admin.action(description="Disable SMS alerts for selected students")
+    def disable_sms_alerts(self, request, queryset):
+        updated = queryset.update(via_sms=False)
+        self.message_user(request, f"SMS alerts disabled for {updated} students")
+
+
+@admin.register(AlertDelivery)
+class AlertDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("alert", "student", "occurrence_date", "channel", "status")
+    list_filter = ("channel", "status", "occurrence_date")
+    list_select_related = ("alert__event", "student")
+    search_fields = ("student__email", "student__matric_number")
+    autocomplete_fields = ("alert", "student")
+    readonly_fields = ("claim_token", "created_at", "sent_at")
@@ -0,0 +1,87 @@
+from typing import Iterator
+
+from django.conf import settings as django_settings
+from django.db import models
+
+from courses.models import CourseTag, Tag
+
+from .models import Alert
+
+
+def resolve_audience(
+    alerts: models.QuerySet, students: models.QuerySet, fields: list[str]
+) -> Iterator[tuple[int, dict]]:
+    """
+    Resolve the audience of several alerts at once.
+
+    The audience rules are evaluated by joining the alerts with the students of their
+    levels and the exceptions (special course tags, opt-ins and opt-outs) in memory,
+    so the number of queries doesn't depend on the number of alerts or students.
+
+    Args:
+    alerts (QuerySet[Alert]): The alerts to resolve the audience of
+    students (QuerySet[User]): The candidate students, e.g. those who opted for email
+    fields (list[str]): The student fields to fetch, in addition to the ID
+
+    Yields:
+    tuple[int, dict]: The alert ID and the fields of a student in its audience
+    """
+    alerts_by_level: dict[int, list[tuple[int, int]]] = {}
+    alerts_by_course: dict[int, list[int]] = {}
+    for alert_id, course_id, level in alerts.values_list(
+        "pk", "event_id", "event__level"
+    ):
+        alerts_by_level.setdefault(level, []).append((alert_id, course_id))
+        alerts_by_course.setdefault(course_id, []).append(alert_id)
+    if not alerts_by_course:
+        return
+    alert_ids = [
+        alert_id for course in alerts_by_course.values() for alert_id in course
+    ]
+
+    # Load the exceptions to the level rule
+    carried_over: set[tuple[int, int]] = set()
+    spilled_over: dict[int, list[int]] = {}
+    for course_id, student_id, tag in CourseTag.objects.filter(
+        course_id__in=alerts_by_course
+    ).values_list("course_id", "student_id", "tag"):
+        if tag == Tag.CARRY_OVER:
+            carried_over.add((course_id, student_id))
+        elif tag == Tag.SPILL_OVER:
+            spilled_over.setdefault(student_id, []).append(course_id)
+
+    opted_in: dict[int, list[int]] = {}
+    for alert_id, student_id in Alert.students.through.objects.filter(
+        alert_id__in=alert_ids
+    ).values_list("alert_id", "user_id"):
+        opted_in.setdefault(student_id, []).append(alert_id)
+
+    opted_out: set[tuple[int, int]] = set(
+        Alert.opted_out_students.through.objects.filter(
+            alert_id__in=alert_ids
+        ).values_list("alert_id", "user_id")
+    )
+
+    candidates = (
+        students.filter(is_lecturer=False)
+        .filter(
+            models.Q(level__in=alerts_by_level)
+            | models.Q(pk__in={*spilled_over, *opted_in})
+        )
+        .values("id", "level", *fields)
+        .iterator(chunk_size=django_settings.ALERT_RECIPIENT_QUERY_CHUNK_SIZE)
+    )
+    for student in candidates:
+        student_id = student["id"]
+        audience_alert_ids = {
+            alert_id
+            for alert_id, course_id in alerts_by_level.get(student["level"], [])
+            if (course_id, student_id) not in carried_over
+        }
+        for course_id in spilled_over.get(student_id, []):
+            audience_alert_ids.update(alerts_by_course[course_id])
+        audience_alert_ids.update(opted_in.get(student_id, []))
+
+        for alert_id in audience_alert_ids:
+            if (alert_id, student_id) not in opted_out:
+                yield alert_id, student
@@ -0,0 +1,83 @@
+import json
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .models import Alert
+
+
+def course_group_name(course_id: int) -> str:
+    return f"alerts_course_{course_id}"
+
+
+class AlertConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes alerts to a connected student. The student joins the group of every course
+    they get alerts for, so that an alert is pushed with a single group_send per
+    course.
+
+    The groups are resolved when the student connects. Clients send a "resubscribe"
+    message after the courses of the student change (e.g. after tagging a course) to
+    join the groups of their new courses and leave the old ones.
+    """
+
+    user = None
+    alert_group_names: list[str] = []
+
+    async def connect(self):
+        self.user = self.scope["user"]
+
+        # Only students receive alerts
+        if not self.user.is_authenticated or self.user.is_lecturer:
+            await self.close(code=4000, reason="Invalid user")
+            return
+
+        self.alert_group_names = await self.get_alert_group_names()
+        for group_name in self.alert_group_names:
+            await self.channel_layer.group_add(group_name, self.channel_name)
+
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        for group_name in self.alert_group_names:
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            message = json.loads(text_data or "")
+        except json.JSONDecodeError:
+            return
+        if isinstance(message, dict) and message.get("type") == "resubscribe":
+            await self.resubscribe()
+
+    async def resubscribe(self):
+        """Join the groups of the current courses of the student and leave the rest."""
+        group_names = await self.get_alert_group_names()
+        for group_name in set(self.alert_group_names) - set(group_names):
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+        for group_name in set(group_names) - set(self.alert_group_names):
+            await self.channel_layer.group_add(group_name, self.channel_name)
+        self.alert_group_names = group_names
+
+    async def alert_message(self, event):
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "alert_id": event["alert_id"],
+                    "course_id": event["course_id"],
+                    "title": event["title"],
+                    "description": event["description"],
+                }
+            )
+        )
+
+    @database_sync_to_async
+    def get_alert_group_names(self) -> list[str]:
+        """Get the groups of the courses of the student."""
+        course_ids = (
+            Alert.objects.for_student(self.user)
+            .filter(is_active=True)
+            .values_list("event_id", flat=True)
+            .distinct()
+        )
+        return [course_group_name(course_id) for course_id in course_ids]
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from alarm.scheduler import AlertScheduler
+from alarm.tasks import send_alerts_task
+from alarm.utils import send_alerts
+from lecture_management_system.utils import log
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a long-running scheduler that fires alerts at their exact trigger time "
+        "instead of on the celery beat interval"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--inline",
+            action="store_true",
+            help="Send the alerts in this process instead of enqueuing a celery task",
+        )
+        parser.add_argument(
+            "--refresh-interval",
+            type=float,
+            help="Seconds between checks for changed alerts and courses",
+        )
+        parser.add_argument(
+            "--reload-interval",
+            type=float,
+            help="Seconds between full reloads of the schedule",
+        )
+
+    def handle(self, *args, **options):
+        inline = options["inline"]
+
+        def fire():
+            try:
+                if inline:
+                    send_alerts()
+                else:
+                    send_alerts_task.delay()
+            except Exception as e:
+                # Keep the scheduler running, the next tick catches up on the window
+                log.error(f"Failed to dispatch due alerts: {e}")
+
+        scheduler = AlertScheduler(
+            fire,
+            refresh_interval=options["refresh_interval"],
+            reload_interval=options["reload_interval"],
+        )
+        self.stdout.write(self.style.SUCCESS("Alert scheduler started"))
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Alert scheduler stopped"))
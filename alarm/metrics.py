@@ -0,0 +1,113 @@
+import os
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .models import DeliveryStatus
+
+# The metrics are recorded by the web and worker processes. When
+# PROMETHEUS_MULTIPROC_DIR is set, each process writes them to its own files in that
+# directory and they are aggregated when collected, so that every scrape sees the
+# metrics of every process.
+
+tick_duration = Histogram(
+    "alarm_tick_duration_seconds",
+    "Time taken to plan (and, when sending inline, deliver) the alerts of a tick",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+tick_queries = Histogram(
+    "alarm_tick_queries",
+    "Database queries run by a tick",
+    buckets=(5, 10, 25, 50, 100, 250, 500, 1000),
+)
+last_tick_duration = Gauge(
+    "alarm_last_tick_duration_seconds",
+    "Duration of the latest tick",
+    multiprocess_mode="mostrecent",
+)
+last_tick_timestamp = Gauge(
+    "alarm_last_tick_timestamp_seconds",
+    "Unix time at which the latest tick ended",
+    multiprocess_mode="mostrecent",
+)
+alerts_fired = Counter("alarm_alerts_fired", "Alerts found due by the ticks")
+recipients_resolved = Counter(
+    "alarm_recipients_resolved",
+    "Students resolved from the audiences of the alerts fired",
+)
+deliveries = Counter(
+    "alarm_deliveries",
+    "Recipients of the chunks delivered, by channel and outcome",
+    ["channel", "status"],
+)
+chunk_failures = Counter(
+    "alarm_chunk_failures",
+    "Chunk delivery attempts that raised, including retried ones",
+    ["channel"],
+)
+send_duration = Histogram(
+    "alarm_send_duration_seconds",
+    "Time taken by a transport to send a chunk",
+    ["channel"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+def collect() -> bytes:
+    """
+    Render every metric in the Prometheus text exposition format, aggregated over
+    every process in multiprocess mode
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+@contextmanager
+def track_tick():
+    """
+    Record the duration and number of queries of the tick run in the block
+    """
+    queries = 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count_query):
+            yield
+    finally:
+        duration = time.perf_counter() - start
+        tick_duration.observe(duration)
+        tick_queries.observe(queries)
+        last_tick_duration.set(duration)
+        last_tick_timestamp.set(time.time())
+
+
+def record_delivery(result: dict):
+    """
+    Record the outcome and latency of the delivery of a chunk
+    """
+    channel = result["channel"]
+    status = DeliveryStatus.SENT if result["sent"] else DeliveryStatus.FAILED
+    deliveries.labels(channel=channel, status=status).inc(result["recipients"])
+    if not result["sent"]:
+        chunk_failures.labels(channel=channel).inc()
+    if result.get("duration") is not None:
+        send_duration.labels(channel=channel).observe(result["duration"])
@@ -0,0 +1,150 @@
+# Generated by Django 5.1 on 2026-10-17 17:55
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alarm", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AlertTick",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_tick_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="alert",
+            name="opted_out_students",
+            field=models.ManyToManyField(
+                blank=True,
+                limit_choices_to={"is_lecturer": False},
+                related_name="muted_alerts",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="alert",
+            name="students",
+            field=models.ManyToManyField(
+                blank=True,
+                limit_choices_to={"is_lecturer": False},
+                related_name="alerts",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="opted in students",
+            ),
+        ),
+        migrations.CreateModel(
+            name="AlertSchedule",
+            fields=[
+                (
+                    "alert",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="schedule",
+                        serialize=False,
+                        to="alarm.alert",
+                    ),
+                ),
+                ("fire_at_minute_of_week", models.PositiveIntegerField()),
+                ("updated_at", models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["fire_at_minute_of_week", "alert"],
+                        name="alarm_schedule_fire_at_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="AlertDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("occurrence_date", models.DateField()),
+                (
+                    "channel",
+                    models.CharField(
+                        choices=[("EMAIL", "Email"), ("SMS", "SMS"), ("PUSH", "Push")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("SENT", "Sent"),
+                            ("FAILED", "Failed"),
+                        ],
+                        default="PENDING",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "claim_token",
+                    models.UUIDField(db_index=True, default=uuid.uuid4, editable=False),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "alert",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deliveries",
+                        to="alarm.alert",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alert_deliveries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Alert deliveries",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("alert", "occurrence_date", "channel", "student"),
+                        name="alarm_unique_alert_delivery",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("student__isnull", True)),
+                        fields=("alert", "occurrence_date", "channel"),
+                        name="alarm_unique_alert_broadcast",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+
+def convert_legacy_alert_students(apps, schema_editor):
+    """
+    Convert the students attached to alerts before audiences were rules. Every
+    student used to be attached to the alert of every course, and removed from it
+    when they deleted it. The students of the level of the course are now in the
+    audience without being attached, so:
+    - the students of the level who removed themselves are opted out;
+    - the attached students of the level are detached, as the rule covers them;
+    - the other attached students are detached from the alert the course was
+      created with, which attached everyone, and kept as opted in to the alerts
+      students created themselves.
+    """
+    Alert = apps.get_model("alarm", "Alert")
+    User = apps.get_model("authentication", "User")
+    AlertStudent = Alert.students.through
+    AlertOptOut = Alert.opted_out_students.through
+
+    students_by_level: dict[int, set[int]] = {}
+    for student_id, level in User.objects.filter(is_lecturer=False).values_list(
+        "pk", "level"
+    ):
+        students_by_level.setdefault(level, set()).add(student_id)
+
+    attached: dict[int, set[int]] = {}
+    for alert_id, student_id in AlertStudent.objects.values_list(
+        "alert_id", "user_id"
+    ).iterator(chunk_size=2000):
+        attached.setdefault(alert_id, set()).add(student_id)
+
+    # The alert created with each course is the first one
+    course_alerts: set[int] = set()
+    seen_courses: set[int] = set()
+    alerts = Alert.objects.order_by("pk").values_list("pk", "event_id", "event__level")
+    opt_outs = []
+    for alert_id, course_id, level in alerts:
+        if course_id not in seen_courses:
+            seen_courses.add(course_id)
+            course_alerts.add(alert_id)
+
+        level_students = students_by_level.get(level, set())
+        students = attached.get(alert_id, set())
+        opt_outs.extend(
+            AlertOptOut(alert_id=alert_id, user_id=student_id)
+            for student_id in level_students - students
+        )
+        if alert_id in course_alerts:
+            detached = students
+        else:
+            detached = students & level_students
+        if detached:
+            AlertStudent.objects.filter(
+                alert_id=alert_id, user_id__in=detached
+            ).delete()
+
+    AlertOptOut.objects.bulk_create(opt_outs, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alarm", "0002_alert_schedule_and_deliveries"),
+        ("authentication", "0001_initial"),
+        ("courses", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_legacy_alert_students, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# Copied from alarm.schedule when the schedule was introduced, so that this
+# migration doesn't change with it
+DAY_INDEX = {
+    day: index
+    for index, day in enumerate(("MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"))
+}
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def backfill_alert_schedule(apps, schema_editor):
+    """
+    Add the alerts created before the schedule to it, as alerts without a schedule
+    entry never fire
+    """
+    Alert = apps.get_model("alarm", "Alert")
+    AlertSchedule = apps.get_model("alarm", "AlertSchedule")
+
+    entries = [
+        AlertSchedule(
+            alert_id=alert_id,
+            fire_at_minute_of_week=(
+                DAY_INDEX[day] * MINUTES_PER_DAY
+                + start_time.hour * 60
+                + start_time.minute
+                - early_minutes
+            )
+            % MINUTES_PER_WEEK,
+        )
+        for alert_id, day, start_time, early_minutes in Alert.objects.filter(
+            schedule__isnull=True
+        )
+        .values_list("pk", "event__day", "event__start_time", "early_minutes")
+        .iterator(chunk_size=2000)
+    ]
+    AlertSchedule.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alarm", "0003_convert_legacy_alert_students"),
+        ("courses", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_alert_schedule, migrations.RunPython.noop),
+    ]
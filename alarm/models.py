@@ -1,18 +1,211 @@
+import uuid
 from datetime import time, datetime, timedelta
 
+from django.conf import settings as django_settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
-from courses.models import Course, SpecialCourse
+from courses.models import Course, CourseTag, Tag
+
+from .schedule import (
+    current_minute_of_week,
+    minute_windows,
+    trigger_minute_expression,
+    trigger_minute_of_week,
+)
 
 # Create your models here.
 User = get_user_model()
 
 
+def special_course_tags(tag: Tag, course=None, student=None) -> models.QuerySet:
+    """
+    Get the course tags with the given tag, for the given course and student.
+    Either may be an outer reference, so that the tags can be used in an Exists check.
+    """
+    tags = CourseTag.objects.filter(tag=tag)
+    if course is not None:
+        tags = tags.filter(course_id=course)
+    if student is not None:
+        tags = tags.filter(student_id=student)
+    return tags
+
+
+class AlertQuerySet(models.QuerySet):
+    def with_fire_at_minute(self):
+        """
+        Annotate each alert with the minute of the week its schedule entry fires at,
+        computed by the database from the day and start time of the course and the
+        early minutes of the alert
+        """
+        return self.annotate(computed_fire_at_minute=trigger_minute_expression())
+
+    def sync_schedule(self) -> int:
+        """
+        Recompute the schedule entries of the selected alerts, using one query to
+        compute the trigger minutes and one bulk upsert to store them
+
+        Returns:
+        int: The number of schedule entries written
+        """
+        entries = [
+            AlertSchedule(alert_id=alert_id, fire_at_minute_of_week=fire_at_minute)
+            for alert_id, fire_at_minute in self.with_fire_at_minute().values_list(
+                "pk", "computed_fire_at_minute"
+            )
+        ]
+        AlertSchedule.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=["alert"],
+            update_fields=["fire_at_minute_of_week", "updated_at"],
+        )
+        return len(entries)
+
+    def due_between(self, start: datetime, end: datetime):
+        """
+        Get the active alerts whose trigger time falls within [start, end)
+        """
+        windows = minute_windows(start, end)
+        if not windows:
+            return self.none()
+
+        condition = models.Q()
+        for first, last in windows:
+            condition |= models.Q(
+                schedule__fire_at_minute_of_week__gte=first,
+                schedule__fire_at_minute_of_week__lt=last,
+            )
+        return self.filter(condition, is_active=True)
+
+    def create_for_courses(self, courses: models.QuerySet) -> list["Alert"]:
+        """
+        Create the alerts of the courses that don't have one yet in bulk and add
+        them to the schedule
+
+        Returns:
+        list[Alert]: The alerts created
+        """
+        alerts = Alert.objects.bulk_create(
+            [
+                Alert.for_course(course)
+                for course in courses.filter(alerts__isnull=True).only(
+                    "id", "code", "name"
+                )
+            ]
+        )
+        if alerts:
+            Alert.objects.filter(pk__in=[alert.pk for alert in alerts]).sync_schedule()
+        return alerts
+
+    def for_student(self, student, include_opted_out: bool = False):
+        """
+        Get the alerts whose audience includes the student: the alerts of the courses
+        of their level they haven't carried over, of the courses they spill over to and
+        the alerts they opted into, except the ones they opted out of unless
+        include_opted_out is set
+        """
+        event = models.OuterRef("event_id")
+        carried_over = models.Exists(
+            special_course_tags(Tag.CARRY_OVER, course=event, student=student.pk)
+        )
+        spilled_over = models.Exists(
+            special_course_tags(Tag.SPILL_OVER, course=event, student=student.pk)
+        )
+        opted_in = models.Exists(
+            Alert.students.through.objects.filter(
+                alert_id=models.OuterRef("pk"), user_id=student.pk
+            )
+        )
+        alerts = self.filter(
+            (models.Q(event__level=student.level) & ~carried_over)
+            | spilled_over
+            | opted_in
+        )
+        if include_opted_out:
+            return alerts
+        opted_out = models.Exists(
+            Alert.opted_out_students.through.objects.filter(
+                alert_id=models.OuterRef("pk"), user_id=student.pk
+            )
+        )
+        return alerts.exclude(opted_out)
+
+    def opt_in(self, student) -> int:
+        """
+        Turn the selected alerts back on for a single student by removing their
+        opt-outs in a single query. The alerts stay as they are for everyone else.
+
+        Returns:
+        int: The number of alerts turned back on
+        """
+        deleted, _ = Alert.opted_out_students.through.objects.filter(
+            alert__in=self, user_id=student.pk
+        ).delete()
+        return deleted
+
+    def opt_out(self, student) -> int:
+        """
+        Turn the selected alerts off for a single student by opting them out of the
+        ones they haven't opted out of yet with a single bulk insert. The alerts stay
+        as they are for everyone else.
+
+        Returns:
+        int: The number of alerts turned off
+        """
+        Through = Alert.opted_out_students.through
+        # Alerts the student already opted out of aren't turned off again
+        alert_ids = self.exclude(opted_out_students=student).values_list(
+            "pk", flat=True
+        )
+        opt_outs = Through.objects.bulk_create(
+            [Through(alert_id=alert_id, user_id=student.pk) for alert_id in alert_ids],
+            ignore_conflicts=True,
+        )
+        return len(opt_outs)
+
+    def activate(self) -> int:
+        """
+        Activate the selected alerts for their whole audience in a single query. This
+        is for lecturers and admins; students use opt_in.
+
+        Returns:
+        int: The number of alerts activated
+        """
+        return self.update(is_active=True)
+
+    def deactivate(self) -> int:
+        """
+        Deactivate the selected alerts for their whole audience in a single query. This
+        is for lecturers and admins; students use opt_out.
+
+        Returns:
+        int: The number of alerts deactivated
+        """
+        return self.update(is_active=False)
+
+
 class Alert(models.Model):
+    """
+    Reminder for a course. Its audience is a rule rather than a list of students:
+    the students of the level of the course, adjusted by their special course tags.
+    Only the exceptions to the rule are stored, as students who opted in or out.
+    """
+
     students = models.ManyToManyField(
-        User, related_name="alerts", limit_choices_to={"is_lecturer": False}
+        User,
+        related_name="alerts",
+        limit_choices_to={"is_lecturer": False},
+        blank=True,
+        verbose_name="opted in students",
+    )
+    opted_out_students = models.ManyToManyField(
+        User,
+        related_name="muted_alerts",
+        limit_choices_to={"is_lecturer": False},
+        blank=True,
     )
     event = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="alerts")
     title = models.CharField(max_length=255)
@@ -21,33 +214,69 @@ class Alert(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True, editable=False)
     is_active = models.BooleanField(default=True)
 
+    objects = AlertQuerySet.as_manager()
+
     @property
     def should_alert(self):
         if not self.is_active:
             return False
+        try:
+            fire_at_minute = self.schedule.fire_at_minute_of_week
+        except AlertSchedule.DoesNotExist:
+            fire_at_minute = trigger_minute_of_week(
+                self.event.day, self.event.start_time, self.early_minutes
+            )
+        return fire_at_minute == current_minute_of_week()
 
-        current_time = timezone.now()
-        # Check if the alert should be triggered today
-        if self.event.day != current_time.strftime("%a").upper():
-            return False
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "early_minutes" in update_fields:
+            Alert.objects.filter(pk=self.pk).sync_schedule()
 
-        # Check if the alert should be triggered now
-        alert_time = datetime.combine(
-            current_time.date(), self.event.start_time
-        ) - timedelta(minutes=self.early_minutes)
-        return current_time >= alert_time
+    @classmethod
+    def for_course(cls, course: Course) -> "Alert":
+        """
+        Build the (unsaved) default alert of a course
+        """
+        return cls(
+            event=course,
+            title=f"{course.code} - {course.name}",
+            description=f"Your {course.code} - {course.name} is starting soon",
+        )
 
-    def is_for_special_course(self):
-        return isinstance(self.event, SpecialCourse)
+    def audience(self) -> models.QuerySet:
+        """
+        Get the students the alert is sent to
+        """
+        student = models.OuterRef("pk")
+        carried_over = models.Exists(
+            special_course_tags(Tag.CARRY_OVER, course=self.event_id, student=student)
+        )
+        spilled_over = models.Exists(
+            special_course_tags(Tag.SPILL_OVER, course=self.event_id, student=student)
+        )
+        opted_in = models.Exists(
+            Alert.students.through.objects.filter(alert_id=self.pk, user_id=student)
+        )
+        opted_out = models.Exists(
+            Alert.opted_out_students.through.objects.filter(
+                alert_id=self.pk, user_id=student
+            )
+        )
+        return (
+            User.objects.filter(is_lecturer=False)
+            .filter(
+                (models.Q(level=self.event.level) & ~carried_over)
+                | spilled_over
+                | opted_in
+            )
+            .exclude(opted_out)
+        )
 
     def get_course(self):
         return self.event
 
-    def get_special_course(self) -> SpecialCourse | None:
-        if self.is_for_special_course():
-            return self.event
-        return None
-
     def get_course_schedule(self) -> tuple[time, time]:
         start_time = self.event.start_time
         end_time = self.event.end_time
@@ -75,6 +304,16 @@ class AlertSettings(models.Model):
     via_email = models.BooleanField(default=True)
     via_sms = models.BooleanField(default=False)
 
+    def update(self, **fields):
+        """
+        Update several settings with a single write
+        """
+        if not fields:
+            return
+        for attr, value in fields.items():
+            setattr(self, attr, value)
+        AlertSettings.objects.filter(pk=self.pk).update(**fields)
+
     def enable_email_alerts(self):
         self.via_email = True
         self.save(update_fields=["via_email"])
@@ -92,4 +331,143 @@ class AlertSettings(models.Model):
         self.save(update_fields=["via_sms"])
 
     def __str__(self):
-        return f"Alert Settings for {self.user}"
+        return f"Alert Settings for {self.student}"
+
+
+class AlertSchedule(models.Model):
+    """
+    Materialized weekly schedule of alerts, indexed by the minute of the week at which
+    each alert fires so that a tick is a single range scan
+    """
+
+    alert = models.OneToOneField(
+        Alert, on_delete=models.CASCADE, related_name="schedule", primary_key=True
+    )
+    fire_at_minute_of_week = models.PositiveIntegerField()
+    # Lets the alert scheduler pick up changed entries without reloading them all
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["fire_at_minute_of_week", "alert"],
+                name="alarm_schedule_fire_at_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"Schedule for {self.alert_id} at minute {self.fire_at_minute_of_week}"
+
+
+class AlertTick(models.Model):
+    """
+    Single row recording the end of the window covered by the last alert tick
+    """
+
+    last_tick_at = models.DateTimeField()
+
+    @classmethod
+    def advance(cls, now: datetime | None = None) -> tuple[datetime, datetime]:
+        """
+        Move the tick forward to the given (or current) time
+
+        Returns:
+        tuple[datetime, datetime]: The [start, end) window not covered by earlier ticks
+        """
+        now = now or timezone.now()
+        max_catchup = timedelta(minutes=django_settings.ALERT_MAX_CATCHUP_MINUTES)
+        with transaction.atomic():
+            tick, created = cls.objects.select_for_update().get_or_create(
+                pk=1, defaults={"last_tick_at": now - timedelta(minutes=1)}
+            )
+            # Don't flood students with stale reminders after a long outage
+            start = max(tick.last_tick_at, now - max_catchup)
+            end = max(start, now)
+            tick.last_tick_at = end
+            tick.save(update_fields=["last_tick_at"])
+        return start, end
+
+    def __str__(self):
+        return f"Last alert tick at {self.last_tick_at}"
+
+
+class DeliveryChannel(models.TextChoices):
+    EMAIL = "EMAIL", _("Email")
+    SMS = "SMS", _("SMS")
+    PUSH = "PUSH", _("Push")
+
+
+class DeliveryStatus(models.TextChoices):
+    PENDING = "PENDING", _("Pending")
+    SENT = "SENT", _("Sent")
+    FAILED = "FAILED", _("Failed")
+
+
+class AlertDelivery(models.Model):
+    """
+    Ledger of alert deliveries. A row is claimed before the alert is sent to a
+    student (or broadcast), and the unique constraints guarantee that a lecture
+    occurrence is claimed only once per channel, however many ticks, retries or
+    workers race
+    """
+
+    alert = models.ForeignKey(
+        Alert, on_delete=models.CASCADE, related_name="deliveries"
+    )
+    # Empty for deliveries broadcast to every connected student at once
+    student = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="alert_deliveries",
+        null=True,
+        blank=True,
+    )
+    occurrence_date = models.DateField()
+    channel = models.CharField(max_length=10, choices=DeliveryChannel.choices)
+    status = models.CharField(
+        max_length=10, choices=DeliveryStatus.choices, default=DeliveryStatus.PENDING
+    )
+    # Identifies the rows inserted by a single claim
+    claim_token = models.UUIDField(default=uuid.uuid4, db_index=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Alert deliveries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["alert", "occurrence_date", "channel", "student"],
+                name="alarm_unique_alert_delivery",
+            ),
+            models.UniqueConstraint(
+                fields=["alert", "occurrence_date", "channel"],
+                condition=models.Q(student__isnull=True),
+                name="alarm_unique_alert_broadcast",
+            ),
+        ]
+
+    @classmethod
+    def claim(
+        cls, deliveries: list["AlertDelivery"]
+    ) -> dict[tuple[int, str, int], int]:
+        """
+        Claim deliveries in bulk, skipping those already claimed by an earlier tick,
+        retry or another worker
+
+        Returns:
+        dict[tuple[int, str, int], int]: The IDs of the deliveries claimed by this
+        call, keyed by (alert_id, channel, student_id)
+        """
+        claim_token = uuid.uuid4()
+        for delivery in deliveries:
+            delivery.claim_token = claim_token
+        cls.objects.bulk_create(deliveries, ignore_conflicts=True, batch_size=1000)
+        return {
+            (alert_id, channel, student_id): pk
+            for pk, alert_id, channel, student_id in cls.objects.filter(
+                claim_token=claim_token
+            ).values_list("pk", "alert_id", "channel", "student_id")
+        }
+
+    def __str__(self):
+        return f"{self.channel} delivery of {self.alert_id} to {self.student_id} for {self.occurrence_date}"
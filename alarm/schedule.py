@@ -0,0 +1,160 @@
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.conf import settings as django_settings
+from django.db import models
+from django.db.models.functions import ExtractHour, ExtractMinute, Mod
+from django.utils import timezone
+
+from courses.models import DayOfWeek
+
+MINUTES_PER_HOUR = 60
+MINUTES_PER_DAY = 24 * MINUTES_PER_HOUR
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Monday is the first day of the week, matching ``datetime.weekday()``
+DAY_INDEX: dict[str, int] = {day: index for index, day in enumerate(DayOfWeek.values)}
+
+
+def get_campus_timezone() -> ZoneInfo:
+    """
+    Get the timezone lecture times are expressed in
+    """
+    return ZoneInfo(django_settings.CAMPUS_TIME_ZONE)
+
+
+def to_campus_time(moment: datetime | None = None) -> datetime:
+    """
+    Convert the given (or current) time to the campus timezone
+    """
+    return timezone.localtime(moment, get_campus_timezone())
+
+
+def minute_of_week(day: str, at: time) -> int:
+    """
+    Get the minute of the week (0 - 10079) for a day of the week and a time of day
+    """
+    return DAY_INDEX[day] * MINUTES_PER_DAY + at.hour * MINUTES_PER_HOUR + at.minute
+
+
+def trigger_minute_of_week(day: str, start_time: time, early_minutes: int) -> int:
+    """
+    Get the minute of the week at which an alert for a lecture should be triggered.
+    Alerts for lectures early on Monday wrap around to the end of the previous week.
+    """
+    return (minute_of_week(day, start_time) - early_minutes) % MINUTES_PER_WEEK
+
+
+def current_minute_of_week(now: datetime | None = None) -> int:
+    """
+    Get the minute of the week for the given (or current) time in the campus timezone
+    """
+    now = to_campus_time(now)
+    return now.weekday() * MINUTES_PER_DAY + now.hour * MINUTES_PER_HOUR + now.minute
+
+
+def trigger_minute_expression(prefix: str = "") -> models.Expression:
+    """
+    Build a database expression computing the trigger minute of the week of an alert.
+
+    Args:
+    prefix (str): The lookup path from the queried model to the alert, e.g. "alert__"
+    """
+    day_index = models.Case(
+        *[
+            models.When(**{f"{prefix}event__day": day}, then=models.Value(index))
+            for day, index in DAY_INDEX.items()
+        ],
+        output_field=models.IntegerField(),
+    )
+    start_time = f"{prefix}event__start_time"
+    return Mod(
+        day_index * MINUTES_PER_DAY
+        + ExtractHour(start_time) * MINUTES_PER_HOUR
+        + ExtractMinute(start_time)
+        - models.F(f"{prefix}early_minutes")
+        + MINUTES_PER_WEEK,
+        MINUTES_PER_WEEK,
+        output_field=models.IntegerField(),
+    )
+
+
+def ceil_to_minute(moment: datetime) -> datetime:
+    """
+    Round a datetime up to the next minute boundary (unless it is already on one)
+    """
+    floored = moment.replace(second=0, microsecond=0)
+    if floored == moment:
+        return floored
+    return floored + timedelta(minutes=1)
+
+
+def minute_windows(start: datetime, end: datetime) -> list[tuple[int, int]]:
+    """
+    Get the ranges of minutes of the week whose boundaries fall within [start, end)
+
+    The window may wrap around the end of the week, in which case it is split into two
+    ranges. Each range is returned as a (first, last + 1) pair of minutes of the week.
+    """
+    # Count the minutes on the campus wall clock, so that the minutes skipped when
+    # clocks go forward fire at the transition. Minutes repeated when clocks go back
+    # are covered twice, the delivery ledger keeps them from being sent twice.
+    first_boundary = ceil_to_minute(to_campus_time(start)).replace(tzinfo=None)
+    last_boundary = ceil_to_minute(to_campus_time(end)).replace(tzinfo=None)
+    count = int((last_boundary - first_boundary).total_seconds()) // 60
+    if count <= 0:
+        return []
+    if count >= MINUTES_PER_WEEK:
+        return [(0, MINUTES_PER_WEEK)]
+
+    first = (
+        first_boundary.weekday() * MINUTES_PER_DAY
+        + first_boundary.hour * MINUTES_PER_HOUR
+        + first_boundary.minute
+    )
+    last = first + count
+    if last <= MINUTES_PER_WEEK:
+        return [(first, last)]
+    return [(first, MINUTES_PER_WEEK), (0, last - MINUTES_PER_WEEK)]
+
+
+def occurrence_date(day: str, after: datetime) -> date:
+    """
+    Get the date of the first lecture held on `day` on or after the local date of
+    `after`, i.e. the occurrence an alert fired since `after` is reminding about
+    """
+    after_date = to_campus_time(after).date()
+    return after_date + timedelta(days=(DAY_INDEX[day] - after_date.weekday()) % 7)
+
+
+def next_fire_times(
+    minutes_of_week: list[int], now: datetime | None = None
+) -> list[datetime]:
+    """
+    Get the next instant (in UTC) each minute of the week occurs on the campus wall
+    clock strictly after the given (or current) time, for many alerts at once
+
+    Args:
+    minutes_of_week (list[int]): The fire minutes of the week of the alerts
+    now (datetime): The time to look from
+
+    Returns:
+    list[datetime]: The next fire time of each alert, in the same order
+    """
+    zone = get_campus_timezone()
+    local_now = to_campus_time(now).replace(tzinfo=None)
+    week_start = datetime.combine(
+        local_now.date() - timedelta(days=local_now.weekday()), time()
+    )
+
+    fire_times: list[datetime] = []
+    for minute in minutes_of_week:
+        local = week_start + timedelta(minutes=minute)
+        if local <= local_now:
+            local += timedelta(days=7)
+        # Local times skipped by a DST transition resolve to the offset in effect
+        # before it, which moves them forward by the size of the gap. Repeated
+        # local times resolve to their first occurrence.
+        offset = local.replace(tzinfo=zone).utcoffset()
+        fire_times.append((local - offset).replace(tzinfo=dt_timezone.utc))
+    return fire_times
@@ -0,0 +1,158 @@
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from django.conf import settings as django_settings
+from django.utils import timezone
+
+from .models import AlertSchedule
+from .schedule import next_fire_times
+from lecture_management_system.utils import log
+
+# Overlap between consecutive refreshes, so that entries written by transactions
+# that committed after the previous refresh began are not missed
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+class AlertScheduler:
+    """
+    In-memory timer service firing alerts at their exact trigger time.
+
+    The scheduler keeps a min-heap of the next fire time of every minute of the week
+    at which at least one alert is scheduled. It sleeps until the earliest deadline,
+    calls `fire` and pushes the next weekly occurrence of that minute back onto the
+    heap. Changed schedule entries are picked up incrementally through their
+    `updated_at` column; entries left in the heap by changed alerts are dropped
+    lazily when they come up.
+    """
+
+    def __init__(
+        self,
+        fire: Callable[[], object],
+        refresh_interval: float | None = None,
+        reload_interval: float | None = None,
+    ):
+        self.fire = fire
+        self.refresh_interval = (
+            refresh_interval
+            if refresh_interval is not None
+            else django_settings.ALERT_SCHEDULER_REFRESH_INTERVAL
+        )
+        self.reload_interval = (
+            reload_interval
+            if reload_interval is not None
+            else django_settings.ALERT_SCHEDULER_RELOAD_INTERVAL
+        )
+        self.heap: list[tuple[datetime, int]] = []
+        self.minute_of_alert: dict[int, int] = {}
+        self.alerts_by_minute: dict[int, set[int]] = {}
+        self.refreshed_at: datetime | None = None
+        self.reloaded_at: datetime | None = None
+
+    def reload(self, now: datetime | None = None):
+        """
+        Rebuild the heap from the whole schedule
+        """
+        now = now or timezone.now()
+        self.heap = []
+        self.minute_of_alert = {}
+        self.alerts_by_minute = {}
+        self.refreshed_at = self.reloaded_at = now
+        self.apply(AlertSchedule.objects.all(), now)
+        log.info(
+            f"Alert scheduler loaded {len(self.minute_of_alert)} alerts at "
+            f"{len(self.heap)} minutes of the week"
+        )
+
+    def refresh(self, now: datetime | None = None):
+        """
+        Apply the schedule entries changed since the previous refresh
+        """
+        now = now or timezone.now()
+        previous_refresh = self.refreshed_at
+        self.refreshed_at = now
+        # Minutes that passed since the previous refresh are scheduled now, so that
+        # alerts changed just before their trigger time still fire this week
+        self.apply(
+            AlertSchedule.objects.filter(
+                updated_at__gte=previous_refresh - REFRESH_OVERLAP
+            ),
+            previous_refresh,
+        )
+
+    def apply(self, entries, after: datetime):
+        """
+        Move the given schedule entries to their fire minute, scheduling the minutes
+        that weren't scheduled yet at their first occurrence after `after`
+        """
+        new_minutes: set[int] = set()
+        for alert_id, minute in entries.values_list(
+            "alert_id", "fire_at_minute_of_week"
+        ):
+            previous = self.minute_of_alert.get(alert_id)
+            if previous == minute:
+                continue
+            if previous is not None:
+                self.alerts_by_minute[previous].discard(alert_id)
+            self.minute_of_alert[alert_id] = minute
+            if minute not in self.alerts_by_minute:
+                self.alerts_by_minute[minute] = set()
+                new_minutes.add(minute)
+            self.alerts_by_minute[minute].add(alert_id)
+
+        minutes = sorted(new_minutes)
+        for fire_at, minute in zip(next_fire_times(minutes, after), minutes):
+            heapq.heappush(self.heap, (fire_at, minute))
+
+    def run_due(self, now: datetime | None = None) -> int:
+        """
+        Fire once for all the minutes whose deadline has passed and reschedule them
+
+        Returns:
+        int: The number of minutes that were due
+        """
+        now = now or timezone.now()
+        due: list[int] = []
+        while self.heap and self.heap[0][0] <= now:
+            _, minute = heapq.heappop(self.heap)
+            if not self.alerts_by_minute.get(minute):
+                # Every alert of this minute moved elsewhere
+                self.alerts_by_minute.pop(minute, None)
+                continue
+            due.append(minute)
+
+        if due:
+            # A single dispatch covers every alert due since the last tick
+            self.fire()
+            for fire_at, minute in zip(next_fire_times(due, now), due):
+                heapq.heappush(self.heap, (fire_at, minute))
+        return len(due)
+
+    def seconds_until_next_wakeup(self, now: datetime | None = None) -> float:
+        """
+        Get how long to sleep before the next deadline or refresh, whichever is first
+        """
+        now = now or timezone.now()
+        wakeup = self.refreshed_at + timedelta(seconds=self.refresh_interval)
+        if self.heap:
+            wakeup = min(wakeup, self.heap[0][0])
+        return max((wakeup - now).total_seconds(), 0)
+
+    def run(self):
+        """
+        Run the scheduler until interrupted
+        """
+        self.reload()
+        # Catch up on the alerts due while the scheduler wasn't running
+        self.fire()
+        while True:
+            time.sleep(self.seconds_until_next_wakeup())
+            now = timezone.now()
+            # Fire before reloading, as a reload only schedules times after now
+            self.run_due(now)
+            if now - self.reloaded_at >= timedelta(seconds=self.reload_interval):
+                self.reload(now)
+            elif now - self.refreshed_at >= timedelta(seconds=self.refresh_interval):
+                self.refresh(now)
+                self.run_due(now)
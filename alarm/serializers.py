@@ -10,10 +10,20 @@ class AlertSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Alert
-        exclude = ("students",)
+        exclude = ("students", "opted_out_students")
         read_only_fields = ("timestamp", "is_active")
 
 
+class AlertIDsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+
+
+class BulkUpdateResultSerializer(serializers.Serializer):
+    updated = serializers.IntegerField(read_only=True)
+
+
 class AlertSettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = AlertSettings
@@ -22,33 +32,12 @@ class AlertSettingsSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         # Ensure that the student can only update their own alert settings
-        if instance.student != self.context["request"].user:
+        if instance.student_id != self.context["request"].user.pk:
             raise serializers.ValidationError(
                 "You cannot update another student's alert settings"
             )
 
-        # Update email alert settings
-        if "via_email" in validated_data:
-            if validated_data.pop("via_email"):
-                instance.enable_email_alerts()
-            else:
-                instance.disable_email_alerts()
-
-        # Update SMS alert settings
-        if "via_sms" in validated_data:
-            if validated_data.pop("via_sms"):
-                instance.enable_sms_alerts()
-            else:
-                instance.disable_sms_alerts()
-
-        # Save the instance to persist the changes
-        instance.save()
-
-        # Update other fields if necessary
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        # Save the instance again to persist other updates
-        instance.save()
+        # Persist every change with a single write
+        instance.update(**validated_data)
 
         return instance
@@ -1,13 +1,73 @@
-from celery import shared_task
+from celery import chord, group, shared_task
+from celery.utils.time import get_exponential_backoff_interval
+from django.conf import settings as django_settings
 
 from lecture_management_system.utils import log
 
 
 @shared_task
 def send_alerts_task():
-    from .utils import send_alerts
+    """
+    Plan the alerts due since the last tick and fan their delivery out to one
+    subtask per chunk of recipients, aggregating the results once all are done
+    """
+    from .metrics import track_tick
+    from .utils import plan_alerts
 
-    errors = send_alerts()
-    if errors:
-        log.error(f"Errors occurred: {errors}")
-        raise Exception(f"Errors occurred: {errors}")
+    with track_tick():
+        chunks = plan_alerts()
+        if not chunks:
+            return None
+
+        log.info(f"Dispatching {len(chunks)} alert chunks")
+        result = chord(group(deliver_alert_chunk_task.s(chunk) for chunk in chunks))(
+            aggregate_alert_results_task.s()
+        )
+    return result.id
+
+
+@shared_task(bind=True, max_retries=django_settings.ALERT_DELIVERY_MAX_RETRIES)
+def deliver_alert_chunk_task(self, chunk: dict):
+    """
+    Deliver a single chunk, retrying it on its own with exponential backoff so that
+    a failure doesn't resend the alert to the other chunks
+    """
+    from . import metrics
+    from .models import DeliveryStatus
+    from .utils import deliver_alert_chunk, delivery_result, mark_deliveries
+
+    try:
+        return deliver_alert_chunk(chunk)
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            log.error(
+                f"Giving up on alert to {len(chunk['recipients'])} recipients: {e}"
+            )
+            mark_deliveries(chunk, DeliveryStatus.FAILED)
+            result = delivery_result(chunk, sent=False, error=str(e))
+            metrics.record_delivery(result)
+            # Report the failure instead of raising so that the chord still completes
+            return result
+        metrics.chunk_failures.labels(channel=chunk["channel"]).inc()
+        countdown = get_exponential_backoff_interval(
+            factor=django_settings.ALERT_DELIVERY_RETRY_BACKOFF,
+            retries=self.request.retries,
+            maximum=django_settings.ALERT_DELIVERY_RETRY_BACKOFF_MAX,
+            full_jitter=True,
+        )
+        raise self.retry(exc=e, countdown=countdown)
+
+
+@shared_task
+def aggregate_alert_results_task(results: list[dict]):
+    """
+    Aggregate the results of the delivery subtasks of a dispatch
+    """
+    from .utils import summarize_delivery_results
+
+    summary = summarize_delivery_results(results)
+    if summary["failed_chunks"]:
+        log.error(f"Alert dispatch finished with failures: {summary}")
+    else:
+        log.info(f"Alert dispatch finished: {summary}")
+    return summary
@@ -1,3 +1,389 @@
-from django.test import TestCase
+import os
+import time as timer
+from importlib import import_module
+from datetime import datetime, time, timedelta
+from unittest import skipUnless
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.testing import log_in
+
+from courses.models import Course, CourseTag, Tag
+from .audience import resolve_audience
+from .models import Alert, AlertDelivery, AlertSchedule, AlertTick, DeliveryChannel
+from .schedule import (
+    MINUTES_PER_WEEK,
+    ceil_to_minute,
+    current_minute_of_week,
+    get_campus_timezone,
+    minute_of_week,
+    minute_windows,
+    next_fire_times,
+    trigger_minute_of_week,
+)
+from .scheduler import AlertScheduler
+from .utils import plan_alerts
+
+User = get_user_model()
+
+PLANNING_QUERIES = 15
+AUDIENCE_QUERIES = 5
+
+
+def create_courses(lecturer, count: int, level: int = 100) -> list[Course]:
+    return [
+        Course.objects.create(
+            name=f"Course {index}",
+            code=f"ABC{level + index}",
+            level=level,
+            lecturer=lecturer,
+            day="MON",
+            venue=f"Room {level + index}",
+            start_time=time(9, 0),
+            end_time=time(10, 0),
+        )
+        for index in range(count)
+    ]
+
+
+def create_students(count: int, level: int = 100) -> list:
+    return [
+        User.objects.create(
+            email=f"student{level}-{index}@example.com",
+            matric_number=f"ABC/{level // 100:02}/{index:04}",
+            level=level,
+        )
+        for index in range(count)
+    ]
+
+
+class PlanAlertsTests(TestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create(
+            email="lecturer@example.com", is_lecturer=True
+        )
+        create_students(5)
+        # The alerts of all the courses fire at Monday 08:30
+        minute = trigger_minute_of_week("MON", time(9, 0), 30)
+        self.now = next_fire_times([minute])[0] + timedelta(seconds=1)
+
+    def assert_planned_with_constant_queries(self, courses: int):
+        create_courses(self.lecturer, courses)
+        Alert.objects.create_for_courses(Course.objects.all())
+        # The tick, the due alerts, the audience (tags, opt-ins, opt-outs and
+        # students) and the ledger claim, whatever the number of alerts
+        with self.assertNumQueries(PLANNING_QUERIES):
+            chunks = plan_alerts(self.now)
+        self.assertEqual(len({chunk["alert"] for chunk in chunks}), courses)
+
+    def test_one_due_alert(self):
+        self.assert_planned_with_constant_queries(1)
+
+    def test_many_due_alerts(self):
+        self.assert_planned_with_constant_queries(10)
+
+
+class DeliveryLedgerTests(TestCase):
+    def setUp(self):
+        lecturer = User.objects.create(email="lecturer@example.com", is_lecturer=True)
+        self.students = create_students(3)
+        create_courses(lecturer, 2)
+        self.alerts = Alert.objects.create_for_courses(Course.objects.all())
+        minute = trigger_minute_of_week("MON", time(9, 0), 30)
+        self.now = next_fire_times([minute])[0] + timedelta(seconds=1)
+
+    def test_replanning_claims_nothing(self):
+        chunks = plan_alerts(self.now)
+        self.assertEqual(
+            {chunk["alert"] for chunk in chunks}, {a.pk for a in self.alerts}
+        )
+        claimed = AlertDelivery.objects.count()
+
+        # Another tick over the same window, e.g. after the tick row was lost
+        AlertTick.objects.all().delete()
+        self.assertEqual(plan_alerts(self.now + timedelta(seconds=30)), [])
+        self.assertEqual(AlertDelivery.objects.count(), claimed)
+
+    def test_overlapping_claims_are_disjoint(self):
+        occurrence = self.now.date()
+
+        def deliveries(students) -> list[AlertDelivery]:
+            return [
+                AlertDelivery(
+                    alert=self.alerts[0],
+                    student=student,
+                    occurrence_date=occurrence,
+                    channel=DeliveryChannel.EMAIL,
+                )
+                for student in students
+            ]
+
+        first = AlertDelivery.claim(deliveries(self.students[:2]))
+        second = AlertDelivery.claim(deliveries(self.students[1:]))
+        self.assertEqual(len(first), 2)
+        self.assertEqual(
+            set(second), {(self.alerts[0].pk, "EMAIL", self.students[2].pk)}
+        )
+        self.assertFalse(set(first.values()) & set(second.values()))
+        self.assertEqual(AlertDelivery.objects.count(), 3)
+
+
+class TickWindowTests(TestCase):
+    def setUp(self):
+        lecturer = User.objects.create(email="lecturer@example.com", is_lecturer=True)
+        create_courses(lecturer, 1)
+        self.alert = Alert.objects.create_for_courses(Course.objects.all())[0]
+        minute = trigger_minute_of_week("MON", time(9, 0), 30)
+        self.fire_at = next_fire_times([minute])[0]
+
+    def due(self, now: datetime) -> set[int]:
+        start, end = AlertTick.advance(now)
+        return set(Alert.objects.due_between(start, end).values_list("pk", flat=True))
+
+    def test_fires_once_across_ticks(self):
+        AlertTick.objects.create(
+            pk=1, last_tick_at=self.fire_at - timedelta(seconds=30)
+        )
+        # The tick straddling the fire minute selects the alert
+        self.assertEqual(
+            self.due(self.fire_at + timedelta(seconds=30)), {self.alert.pk}
+        )
+        # The next tick starts where it ended, past the fire minute
+        self.assertEqual(self.due(self.fire_at + timedelta(seconds=90)), set())
+        self.assertEqual(self.due(self.fire_at + timedelta(seconds=150)), set())
+
+    def test_window_wrapping_around_the_week(self):
+        zone = get_campus_timezone()
+        sunday = datetime(2026, 10, 18, 23, 58, 30, tzinfo=zone)
+        self.assertEqual(sunday.weekday(), 6)
+        self.assertEqual(
+            minute_windows(sunday, sunday + timedelta(minutes=3)),
+            [(MINUTES_PER_WEEK - 1, MINUTES_PER_WEEK), (0, 2)],
+        )
+
+    def test_window_without_boundary(self):
+        start = self.fire_at + timedelta(seconds=1)
+        self.assertEqual(minute_windows(start, start + timedelta(seconds=30)), [])
+
+
+class AlertSchedulerTests(TestCase):
+    def setUp(self):
+        lecturer = User.objects.create(email="lecturer@example.com", is_lecturer=True)
+        create_courses(lecturer, 1)
+        self.alert = Alert.objects.create_for_courses(Course.objects.all())[0]
+        self.minute = trigger_minute_of_week("MON", time(9, 0), 30)
+        self.fires: list[bool] = []
+        self.scheduler = AlertScheduler(
+            fire=lambda: self.fires.append(True),
+            refresh_interval=5,
+            reload_interval=3600,
+        )
+        # Refreshes pick up the entries updated since the previous one, so they are
+        # run at the current time. Deadlines are checked at any time.
+        self.loaded_at = timezone.now()
+        self.scheduler.reload(self.loaded_at)
+
+    def move_alert(self, minute: int):
+        self.alert.early_minutes = (
+            minute_of_week("MON", time(9, 0)) - minute
+        ) % MINUTES_PER_WEEK
+        self.alert.save()
+
+    def test_due_minute_fires_once_and_weekly(self):
+        fire_at = next_fire_times([self.minute], self.loaded_at)[0]
+        self.assertEqual(self.scheduler.run_due(fire_at - timedelta(seconds=1)), 0)
+        self.assertEqual(self.scheduler.run_due(fire_at), 1)
+        self.assertEqual(self.scheduler.run_due(fire_at + timedelta(minutes=1)), 0)
+        self.assertEqual(len(self.fires), 1)
+
+        week_later = next_fire_times([self.minute], fire_at)[0]
+        self.assertEqual(self.scheduler.heap, [(week_later, self.minute)])
+        self.assertGreaterEqual(week_later - fire_at, timedelta(days=6))
+
+    def test_moved_alert_leaves_old_minute(self):
+        new_minute = trigger_minute_of_week("MON", time(9, 0), 60)
+        self.move_alert(new_minute)
+        self.scheduler.refresh(self.loaded_at + timedelta(seconds=10))
+
+        deadline = max(next_fire_times([self.minute, new_minute], self.loaded_at))
+        self.assertEqual(self.scheduler.run_due(deadline), 1)
+        self.assertEqual(len(self.fires), 1)
+        self.assertEqual([minute for _, minute in self.scheduler.heap], [new_minute])
+        self.assertNotIn(self.minute, self.scheduler.alerts_by_minute)
+
+    def test_alert_changed_before_deadline_fires(self):
+        # The alert is moved to a minute whose deadline passes before the next
+        # refresh picks the change up
+        fire_at = ceil_to_minute(self.loaded_at + timedelta(seconds=1))
+        self.move_alert(current_minute_of_week(fire_at))
+        now = fire_at + timedelta(seconds=1)
+        self.scheduler.refresh(now)
+
+        self.assertEqual(self.scheduler.run_due(now), 1)
+        self.assertEqual(len(self.fires), 1)
+
+
+class BackfillScheduleTests(TestCase):
+    def test_upgraded_alert_fires(self):
+        lecturer = User.objects.create(email="lecturer@example.com", is_lecturer=True)
+        create_students(1)
+        create_courses(lecturer, 1)
+        alert = Alert.objects.create_for_courses(Course.objects.all())[0]
+        # Alerts created before the schedule have no entry
+        AlertSchedule.objects.all().delete()
+
+        migration = import_module("alarm.migrations.0004_backfill_alert_schedule")
+        migration.backfill_alert_schedule(apps, None)
+
+        minute = trigger_minute_of_week("MON", time(9, 0), 30)
+        self.assertEqual(alert.schedule.fire_at_minute_of_week, minute)
+        now = next_fire_times([minute])[0] + timedelta(seconds=1)
+        self.assertEqual({chunk["alert"] for chunk in plan_alerts(now)}, {alert.pk})
+
+
+class ResolveAudienceTests(TestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create(
+            email="lecturer@example.com", is_lecturer=True
+        )
+        self.students = create_students(4)
+        self.other_level = create_students(2, level=200)
+        self.courses = create_courses(self.lecturer, 3)
+        Alert.objects.create_for_courses(Course.objects.all())
+        self.alerts = list(Alert.objects.order_by("pk"))
+
+    def resolve(self) -> set[tuple[int, int]]:
+        return {
+            (alert_id, student["id"])
+            for alert_id, student in resolve_audience(
+                Alert.objects.all(), User.objects.all(), ["email"]
+            )
+        }
+
+    def test_constant_queries(self):
+        # The alerts, the tags, the opt-ins, the opt-outs and the students
+        with self.assertNumQueries(AUDIENCE_QUERIES):
+            self.resolve()
+
+        create_courses(self.lecturer, 10, level=200)
+        Alert.objects.create_for_courses(Course.objects.all())
+        with self.assertNumQueries(AUDIENCE_QUERIES):
+            self.resolve()
+
+    def test_matches_audience(self):
+        carried_over, spilled_over = self.students[0], self.other_level[0]
+        CourseTag.objects.tag(carried_over, [self.courses[0].pk], Tag.CARRY_OVER)
+        CourseTag.objects.tag(spilled_over, [self.courses[1].pk], Tag.SPILL_OVER)
+        self.alerts[1].opted_out_students.add(self.students[1])
+        self.alerts[2].students.add(self.other_level[1])
+
+        expected = {
+            (alert.pk, student_id)
+            for alert in self.alerts
+            for student_id in alert.audience().values_list("pk", flat=True)
+        }
+        self.assertEqual(self.resolve(), expected)
+        self.assertNotIn((self.alerts[0].pk, carried_over.pk), expected)
+        self.assertIn((self.alerts[1].pk, spilled_over.pk), expected)
+        self.assertNotIn((self.alerts[1].pk, self.students[1].pk), expected)
+        self.assertIn((self.alerts[2].pk, self.other_level[1].pk), expected)
+
+
+class ToggleAlertsTests(TestCase):
+    def setUp(self):
+        lecturer = User.objects.create(email="lecturer@example.com", is_lecturer=True)
+        self.student, self.classmate = create_students(2)
+        create_courses(lecturer, 2)
+        self.alerts = Alert.objects.create_for_courses(Course.objects.all())
+        self.ids = [alert.pk for alert in self.alerts]
+        self.client = APIClient()
+        log_in(self.client, self.student)
+
+    def audience(self, student) -> set[int]:
+        return set(Alert.objects.for_student(student).values_list("pk", flat=True))
+
+    def test_bulk_deactivate_is_per_student(self):
+        response = self.client.post(
+            "/api/alerts/bulk-deactivate", {"ids": self.ids}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated"], 2)
+        self.assertEqual(self.audience(self.student), set())
+        self.assertEqual(self.audience(self.classmate), set(self.ids))
+        self.assertEqual(Alert.objects.filter(is_active=True).count(), 2)
+
+        # Alerts already turned off aren't counted again
+        response = self.client.post(
+            "/api/alerts/bulk-deactivate", {"ids": self.ids}, format="json"
+        )
+        self.assertEqual(response.data["updated"], 0)
+
+        response = self.client.post(
+            "/api/alerts/bulk-activate", {"ids": self.ids}, format="json"
+        )
+        self.assertEqual(response.data["updated"], 2)
+        self.assertEqual(self.audience(self.student), set(self.ids))
+
+    def test_deactivate_is_per_student(self):
+        alert_id = self.ids[0]
+        response = self.client.post(f"/api/alerts/{alert_id}/deactivate")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(alert_id, self.audience(self.student))
+        self.assertIn(alert_id, self.audience(self.classmate))
+        self.assertTrue(Alert.objects.get(pk=alert_id).is_active)
+
+        response = self.client.post(f"/api/alerts/{alert_id}/activate")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(alert_id, self.audience(self.student))
+
+
+class MetricsViewTests(TestCase):
+    def test_disabled_without_token(self):
+        with override_settings(ALERT_METRICS_TOKEN=None):
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer ")
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(ALERT_METRICS_TOKEN="secret")
+    def test_requires_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"alarm_deliveries_total", response.content)
+
+
+class NextFireTimesTests(TestCase):
+    @override_settings(CAMPUS_TIME_ZONE="Australia/Lord_Howe")
+    def test_half_hour_transition(self):
+        # Lord Howe Island moves from +10:30 to +11:00 at 02:00 on 4 October 2026,
+        # so that 02:45 comes 15 minutes after 02:00 on the previous offset
+        zone = ZoneInfo("Australia/Lord_Howe")
+        now = datetime(2026, 10, 3, 12, 0, tzinfo=zone)
+        minutes = [
+            minute_of_week("SUN", time(1, 45)),
+            minute_of_week("SUN", time(2, 45)),
+        ]
+
+        fire_times = next_fire_times(minutes, now)
+        self.assertEqual(
+            [
+                fire_time.astimezone(zone).replace(tzinfo=None)
+                for fire_time in fire_times
+            ],
+            [datetime(2026, 10, 4, 1, 45), datetime(2026, 10, 4, 2, 45)],
+        )
+        self.assertEqual(fire_times[1] - fire_times[0], timedelta(minutes=30))
+
+    @skipUnless(os.environ.get("RUN_BENCHMARKS"), "Set RUN_BENCHMARKS to run")
+    def test_benchmark(self):
+        minutes = list(range(MINUTES_PER_WEEK)) * 10
+        start = timer.perf_counter()
+        next_fire_times(minutes)
+        print(f"\n{len(minutes)} fire times in {timer.perf_counter() - start:.3f}s")
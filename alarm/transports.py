@@ -0,0 +1,275 @@
+import asyncio
+import time
+from smtplib import SMTPServerDisconnected
+
+import requests
+from channels.layers import get_channel_layer
+from django.conf import settings as django_settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .consumers import course_group_name
+from .models import DeliveryChannel
+
+# Mail connection shared by every delivery made by this worker process
+_mail_connection: BaseEmailBackend | None = None
+
+
+def get_mail_connection() -> BaseEmailBackend:
+    """
+    Get the mail connection of the current worker process, opening it if needed
+    """
+    global _mail_connection
+    if _mail_connection is None:
+        _mail_connection = get_connection(fail_silently=False)
+    _mail_connection.open()
+    return _mail_connection
+
+
+def reset_mail_connection():
+    """
+    Close the mail connection of the current worker process so that the next
+    delivery opens a fresh one
+    """
+    global _mail_connection
+    if _mail_connection is not None:
+        try:
+            _mail_connection.close()
+        except Exception:
+            pass
+    _mail_connection = None
+
+
+def build_alert_message(
+    title: str, description: str, recipients: list[str]
+) -> EmailMessage:
+    """
+    Build an alert email addressed via BCC so that students don't see each other's
+    addresses
+    """
+    return EmailMessage(
+        subject=f"Alert from Lecture Management System: {title}",
+        body=description,
+        from_email=django_settings.FROM_EMAIL,
+        bcc=recipients,
+    )
+
+
+def send_message(message: EmailMessage):
+    """
+    Send a message over the shared mail connection, reconnecting once if the server
+    dropped the idle connection
+
+    Raises:
+    Exception: If the message could not be sent
+    """
+    try:
+        try:
+            get_mail_connection().send_messages([message])
+        except SMTPServerDisconnected:
+            reset_mail_connection()
+            get_mail_connection().send_messages([message])
+    except Exception:
+        reset_mail_connection()
+        raise
+
+
+class RateLimiter:
+    """
+    Async context manager letting at most `concurrency` sends run at a time and
+    starting at most `rate` of them per second (no limit if `rate` is 0)
+    """
+
+    def __init__(self, rate: float, concurrency: int):
+        self.interval = 1 / rate if rate else 0
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.lock = asyncio.Lock()
+        self.next_slot = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.interval:
+            async with self.lock:
+                now = time.monotonic()
+                delay = self.next_slot - now
+                self.next_slot = max(now, self.next_slot) + self.interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+
+class Transport:
+    """
+    Base class of alert transports. A transport delivers an alert to a batch of
+    students over one channel.
+    """
+
+    channel: str
+    # Student field holding the address of the student on the channel
+    address_field: str
+    # Student field telling whether the student opted for the channel, if any
+    opt_in_field: str | None = None
+    # Whether an alert is sent once to the group of its course rather than to
+    # each student, in which case the recipients of a chunk are course IDs
+    broadcast: bool = False
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        rate_limit: float = 0,
+        concurrency: int = 1,
+        options: dict | None = None,
+    ):
+        self.batch_size = batch_size
+        self.rate_limit = rate_limit
+        self.concurrency = concurrency
+        self.options = options or {}
+
+    def accepts(self, student: dict) -> bool:
+        """
+        Check whether an alert can be delivered to a student over the channel
+        """
+        if self.opt_in_field and not student[self.opt_in_field]:
+            return False
+        return bool(student[self.address_field])
+
+    def limiter(self) -> RateLimiter:
+        """
+        Create the rate limiter of a dispatch, in the event loop running it
+        """
+        return RateLimiter(self.rate_limit, self.concurrency)
+
+    async def send(self, chunk: dict):
+        """
+        Deliver the alert of a chunk to its recipients
+
+        Raises:
+        Exception: If the alert could not be delivered
+        """
+        raise NotImplementedError
+
+
+class EmailTransport(Transport):
+    channel = DeliveryChannel.EMAIL
+    address_field = "email"
+    opt_in_field = "alert_settings__via_email"
+
+    async def send(self, chunk: dict):
+        message = build_alert_message(
+            chunk["title"], chunk["description"], chunk["recipients"]
+        )
+        await asyncio.to_thread(send_message, message)
+
+
+class HTTPSMSTransport(Transport):
+    """
+    Sends SMS alerts through an HTTP gateway, configured with the URL, API_KEY,
+    SENDER and TIMEOUT options
+    """
+
+    channel = DeliveryChannel.SMS
+    address_field = "phone_number"
+    opt_in_field = "alert_settings__via_sms"
+
+    async def send(self, chunk: dict):
+        await asyncio.to_thread(self.post, chunk)
+
+    def post(self, chunk: dict):
+        response = requests.post(
+            self.options["URL"],
+            json={
+                "from": self.options.get("SENDER"),
+                "to": chunk["recipients"],
+                "message": f"{chunk['title']}: {chunk['description']}",
+            },
+            headers={"Authorization": f"Bearer {self.options.get('API_KEY', '')}"},
+            timeout=self.options.get("TIMEOUT", 10),
+        )
+        response.raise_for_status()
+
+
+class LocmemSMSTransport(Transport):
+    """
+    Keeps SMS alerts in memory instead of sending them, for local development and
+    tests
+    """
+
+    channel = DeliveryChannel.SMS
+    address_field = "phone_number"
+    opt_in_field = "alert_settings__via_sms"
+    outbox: list[dict] = []
+
+    async def send(self, chunk: dict):
+        self.outbox.append(
+            {
+                "to": chunk["recipients"],
+                "message": f"{chunk['title']}: {chunk['description']}",
+            }
+        )
+
+
+class PushTransport(Transport):
+    """
+    Pushes in-app alerts to the connected clients of the students over the Channels
+    layer, with one message to the group of each course
+    """
+
+    channel = DeliveryChannel.PUSH
+    address_field = "id"
+    broadcast = True
+
+    async def send(self, chunk: dict):
+        channel_layer = get_channel_layer()
+        await asyncio.gather(
+            *(
+                channel_layer.group_send(
+                    course_group_name(course_id),
+                    {
+                        "type": "alert.message",
+                        "alert_id": chunk["alert"],
+                        "course_id": course_id,
+                        "title": chunk["title"],
+                        "description": chunk["description"],
+                    },
+                )
+                for course_id in chunk["recipients"]
+            )
+        )
+
+
+_transports: dict[str, Transport] | None = None
+
+
+def get_transports() -> dict[str, Transport]:
+    """
+    Get the transports configured in the ALERT_TRANSPORTS setting, keyed by channel
+    """
+    global _transports
+    if _transports is None:
+        _transports = {
+            channel: import_string(config["BACKEND"])(
+                batch_size=config.get("BATCH_SIZE", 100),
+                rate_limit=config.get("RATE_LIMIT", 0),
+                concurrency=config.get("CONCURRENCY", 1),
+                options=config.get("OPTIONS"),
+            )
+            for channel, config in django_settings.ALERT_TRANSPORTS.items()
+        }
+    return _transports
+
+
+def get_transport(channel: str) -> Transport:
+    return get_transports()[channel]
+
+
+@receiver(setting_changed)
+def reset_transports(setting, **kwargs):
+    global _transports
+    if setting == "ALERT_TRANSPORTS":
+        _transports = None
@@ -1,115 +1,260 @@
-from django.core.mail import send_mail
-from django.conf import settings as django_settings
+import asyncio
+import time
+from datetime import datetime
+from typing import Hashable, Iterable
 
-from .models import Alert, AlertSettings
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from . import metrics
+from .audience import resolve_audience
+from .models import Alert, AlertDelivery, AlertTick, DeliveryStatus
+from .schedule import occurrence_date
+from .transports import get_transport, get_transports
 from lecture_management_system.utils import log
 
+User = get_user_model()
+
 
-def send_alerts():
+def chunk_recipients(recipients: Iterable[Hashable], size: int) -> list[list[Hashable]]:
     """
-    Send alerts to all users who have active alerts
+    Split recipients into sorted chunks of at most `size` unique addresses
+    """
+    unique_recipients = sorted({recipient for recipient in recipients if recipient})
+    return [
+        unique_recipients[index : index + size]
+        for index in range(0, len(unique_recipients), size)
+    ]
+
+
+def deliver_alert_chunk(chunk: dict) -> dict:
+    """
+    Deliver the alert of a chunk of recipients over its channel
+
+    Args:
+    chunk (dict): The channel, title, description, recipients and delivery IDs of
+    the alert
 
     Returns:
-    list[Exception]: A list of errors that occurred while sending alerts
+    dict: The channel, title, number of recipients, whether the alert was sent and
+    the error if it wasn't
+
+    Raises:
+    Exception: If the alert could not be delivered
+    """
+    start = time.perf_counter()
+    async_to_sync(get_transport(chunk["channel"]).send)(chunk)
+    result = delivery_result(chunk, sent=True, duration=time.perf_counter() - start)
+    mark_deliveries(chunk, DeliveryStatus.SENT)
+    metrics.record_delivery(result)
+    log.info(f"Sent {chunk['channel']} alert to {len(chunk['recipients'])} recipients")
+    return result
+
+
+def delivery_result(
+    chunk: dict,
+    sent: bool,
+    error: str | None = None,
+    duration: float | None = None,
+) -> dict:
+    return {
+        "channel": chunk["channel"],
+        "title": chunk["title"],
+        "recipients": len(chunk["recipients"]),
+        "sent": sent,
+        "error": error,
+        "duration": duration,
+    }
+
+
+def summarize_delivery_results(results: list[dict]) -> dict:
+    """
+    Aggregate the outcome of the chunks of a dispatch
     """
-    # Get all users with active alerts
-    errors: list[Exception] = []
-
-    # Get alerts that should be sent and where students opted for email notifications
-    alerts = Alert.objects.filter(
-        should_alert=True, students__alert_settings__via_email=True
-    ).distinct()
-
-    # Map descriptions to recipient emails
-    mail_title_to_description_to_recipients_email_map: dict[
-        str, dict[str, set[str]]
-    ] = {}
-
-    for alert in alerts:
-        if alert.title not in mail_title_to_description_to_recipients_email_map:
-            mail_title_to_description_to_recipients_email_map[alert.title] = {}
-        if (
-            alert.description
-            not in mail_title_to_description_to_recipients_email_map[alert.title]
-        ):
-            mail_title_to_description_to_recipients_email_map[alert.title][
-                alert.description
-            ] = set()
-        mail_title_to_description_to_recipients_email_map[alert.title][
-            alert.description
-        ].update(
-            alert.students.filter(alert_settings__via_email=True).values_list(
-                "email", flat=True
+    failed = [result for result in results if not result["sent"]]
+    return {
+        "chunks": len(results),
+        "recipients": sum(result["recipients"] for result in results),
+        "failed_chunks": len(failed),
+        "failed_recipients": sum(result["recipients"] for result in failed),
+        "errors": [result["error"] for result in failed],
+    }
+
+
+def plan_alerts(now: datetime | None = None) -> list[dict]:
+    """
+    Select the alerts due since the last tick, claim their deliveries on every
+    channel the students opted for in the ledger and split the recipients into
+    chunks that can be delivered independently. Deliveries already claimed for the
+    occurrence are skipped.
+
+    Returns:
+    list[dict]: The channel, title, description, recipients and delivery IDs of
+    each chunk
+    """
+    start, end = AlertTick.advance(now)
+    alerts = Alert.objects.due_between(start, end)
+
+    alert_details = {
+        alert_id: (title, description, course_id, occurrence_date(day, start))
+        for alert_id, title, description, course_id, day in alerts.values_list(
+            "pk", "title", "description", "event_id", "event__day"
+        )
+    }
+    if not alert_details:
+        return []
+    metrics.alerts_fired.inc(len(alert_details))
+
+    transports = get_transports()
+    planned: list[tuple[AlertDelivery, Hashable]] = []
+
+    # Broadcast channels deliver an alert once to the group of its course
+    for alert_id, (_, _, course_id, occurrence) in alert_details.items():
+        for channel, transport in transports.items():
+            if transport.broadcast:
+                delivery = AlertDelivery(
+                    alert_id=alert_id, occurrence_date=occurrence, channel=channel
+                )
+                planned.append((delivery, course_id))
+
+    # Resolve the audience of all due alerts once, with the addresses and settings
+    # every other channel needs
+    student_transports = {
+        channel: transport
+        for channel, transport in transports.items()
+        if not transport.broadcast
+    }
+    fields = {
+        field
+        for transport in student_transports.values()
+        for field in (transport.address_field, transport.opt_in_field)
+        if field and field != "id"
+    }
+    if student_transports:
+        recipients = resolve_audience(alerts, User.objects.all(), sorted(fields))
+    else:
+        recipients = []
+
+    resolved = 0
+    for alert_id, student in recipients:
+        resolved += 1
+        for channel, transport in student_transports.items():
+            if not transport.accepts(student):
+                continue
+            delivery = AlertDelivery(
+                alert_id=alert_id,
+                student_id=student["id"],
+                occurrence_date=alert_details[alert_id][3],
+                channel=channel,
             )
+            planned.append((delivery, student[transport.address_field]))
+    metrics.recipients_resolved.inc(resolved)
+    claimed = AlertDelivery.claim([delivery for delivery, _ in planned])
+
+    # Map channels, titles and descriptions to addresses and their delivery IDs
+    recipients_map: dict[tuple[str, int], dict[Hashable, list[int]]] = {}
+    for delivery, address in planned:
+        delivery_id = claimed.get(
+            (delivery.alert_id, delivery.channel, delivery.student_id)
+        )
+        if delivery_id is None:
+            continue
+        recipients = recipients_map.setdefault(
+            (delivery.channel, delivery.alert_id), {}
         )
+        recipients.setdefault(address, []).append(delivery_id)
+
+    return [
+        {
+            "channel": channel,
+            "alert": alert_id,
+            "title": alert_details[alert_id][0],
+            "description": alert_details[alert_id][1],
+            "recipients": chunk,
+            "deliveries": [
+                delivery_id for address in chunk for delivery_id in recipients[address]
+            ],
+        }
+        for (channel, alert_id), recipients in recipients_map.items()
+        for chunk in chunk_recipients(recipients, transports[channel].batch_size)
+    ]
+
+
+def mark_deliveries(chunks: dict | list[dict], status: DeliveryStatus) -> int:
+    """
+    Record the outcome of one or more chunks in the delivery ledger in one query
+    """
+    if isinstance(chunks, dict):
+        chunks = [chunks]
+    delivery_ids = [
+        delivery_id for chunk in chunks for delivery_id in chunk["deliveries"]
+    ]
+    if not delivery_ids:
+        return 0
+    sent_at = timezone.now() if status == DeliveryStatus.SENT else None
+    return AlertDelivery.objects.filter(pk__in=delivery_ids).update(
+        status=status, sent_at=sent_at
+    )
+
+
+async def dispatch_chunks(chunks: list[dict]) -> list[dict]:
+    """
+    Deliver chunks concurrently, across all channels at once, within the rate limits
+    of each channel
+
+    Returns:
+    list[dict]: The delivery outcome of each chunk, in the same order
+    """
+    limiters = {
+        channel: get_transport(channel).limiter()
+        for channel in {chunk["channel"] for chunk in chunks}
+    }
 
-    for (
-        title,
-        description_to_recipients_email_map,
-    ) in mail_title_to_description_to_recipients_email_map.items():
-        for description, recipients in description_to_recipients_email_map.items():
+    async def deliver(chunk: dict) -> dict:
+        async with limiters[chunk["channel"]]:
+            start = time.perf_counter()
             try:
-                send_mail(
-                    title=f"Alert from Lecture Management System: {title}",
-                    message=description,
-                    from_email=django_settings.FROM_EMAIL,
-                    recipient_list=recipients,
-                    fail_silently=False,
-                )
-                log.info(f"Sent alert to {recipients}")
+                await get_transport(chunk["channel"]).send(chunk)
             except Exception as e:
-                errors.append(e)
-
-    return errors
-    # description_to_recipients_email_map: dict[str, set[str]] = {}
-
-    # for alert in alerts:
-    #     if alert.description not in description_to_recipients_email_map:
-    #         description_to_recipients_email_map[alert.description] = set()
-    #     description_to_recipients_email_map[alert.description].update(
-    #         alert.students.filter(alert_settings__via_email=True).values_list(
-    #             "email", flat=True
-    #         )
-    #     )
-
-    # # Send the alerts to the recipients
-    # for description, recipients in description_to_recipients_email_map.items():
-    #     try:
-    #         send_mail(
-    #             title="Alert from Lecture Management System",
-    #             message=description,
-    #             from_email=django_settings.FROM_EMAIL,
-    #             recipient_list=recipients,
-    #             fail_silently=False,
-    #         )
-    #         log.info(f"Sent alert to {recipients}")
-    #         # TODO: Implement sending SMS alerts
-    #     except Exception as e:
-    #         errors.append(e)
-
-
-def send_alert_with_mail(alert: Alert):
-    user = alert.user
-    settings: AlertSettings = user.alert_settings
-    if not alert.is_active or not alert.should_alert:
-        raise ValueError("Alert is not active or should not be triggered")
-    elif not settings.via_email:
-        raise ValueError("User has disabled email alerts")
-    send_mail(
-        title=alert.title,
-        message=alert.description,
-        from_email=django_settings.EMAIL_HOST_USER,
-        recipient_list=[user.email],
-        fail_silently=False,
-    )
+                log.error(
+                    f"Failed to send {chunk['channel']} alert to "
+                    f"{len(chunk['recipients'])} recipients: {e}"
+                )
+                return delivery_result(
+                    chunk,
+                    sent=False,
+                    error=str(e),
+                    duration=time.perf_counter() - start,
+                )
+        return delivery_result(chunk, sent=True, duration=time.perf_counter() - start)
+
+    return await asyncio.gather(*(deliver(chunk) for chunk in chunks))
 
 
-def send_alert_with_sms(alert: Alert):
-    user = alert.user
-    settings: AlertSettings = user.alert_settings
-    if not alert.is_active or not alert.should_alert:
-        raise ValueError("Alert is not active or should not be triggered")
-    elif not settings.via_sms:
-        raise ValueError("User has disabled sms alerts")
-    # Send SMS alert
-    pass
+def send_alerts(now: datetime | None = None) -> list[dict]:
+    """
+    Send alerts to all users who have active alerts due since the last tick,
+    delivering every chunk concurrently in the current process
+
+    Returns:
+    list[dict]: The delivery outcome of each chunk of recipients
+    """
+    with metrics.track_tick():
+        chunks = plan_alerts(now)
+        if not chunks:
+            return []
+
+        results = async_to_sync(dispatch_chunks)(chunks)
+        outcomes = list(zip(chunks, results))
+        mark_deliveries(
+            [chunk for chunk, result in outcomes if result["sent"]],
+            DeliveryStatus.SENT,
+        )
+        mark_deliveries(
+            [chunk for chunk, result in outcomes if not result["sent"]],
+            DeliveryStatus.FAILED,
+        )
+    for result in results:
+        metrics.record_delivery(result)
+    return results
@@ -1,13 +1,28 @@
+import hmac
+
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from django.conf import settings as django_settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
 
 from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from alarm import metrics
 from alarm.models import AlertSettings
 from authentication.permissions import IsStudent
-from .serializers import AlertSerializer, AlertSettingsSerializer, Alert
+from .serializers import (
+    AlertIDsSerializer,
+    AlertSerializer,
+    AlertSettingsSerializer,
+    BulkUpdateResultSerializer,
+    Alert,
+)
 
 # Create your views here.
 
@@ -69,6 +84,14 @@ from .serializers import AlertSerializer, AlertSettingsSerializer, Alert
             )
         ],
     ),
+    bulk_activate=extend_schema(
+        summary="Activate several alerts of logged in student",
+        description="Activate the alerts of logged in student with the given IDs",
+    ),
+    bulk_deactivate=extend_schema(
+        summary="Deactivate several alerts of logged in student",
+        description="Deactivate the alerts of logged in student with the given IDs",
+    ),
     update=extend_schema(
         summary="Update an alert of logged in student",
         description="Update an alert of logged in student",
@@ -107,31 +130,64 @@ class AlertViewSet(
     serializer_class = AlertSerializer
 
     def get_queryset(self):
-        return self.request.user.alerts.all()
+        return Alert.objects.for_student(self.request.user)
 
     def perform_create(self, serializer):
         alert = serializer.save()
         alert.students.add(self.request.user)
 
     def perform_destroy(self, instance):
+        # Opt the student out of the alert instead of deleting it for everyone
         instance.students.remove(self.request.user)
-        if not instance.students.exists():
-            instance.delete()
+        instance.opted_out_students.add(self.request.user)
+
+    # Activating and deactivating only change what the logged in student receives:
+    # the alerts are shared by their whole audience, so is_active is left to
+    # lecturers and admins.
+
+    def get_toggle_queryset(self):
+        # Include the alerts the student opted out of, so they can turn them back on
+        return Alert.objects.for_student(self.request.user, include_opted_out=True)
 
     @extend_schema(request=OpenApiTypes.NONE)
     @action(detail=True, methods=["POST"])
     def activate(self, request, pk=None):
-        alert: Alert = self.get_object()
-        alert.activate()
+        alert: Alert = get_object_or_404(self.get_toggle_queryset(), pk=pk)
+        Alert.objects.filter(pk=alert.pk).opt_in(request.user)
         return Response(AlertSerializer(alert).data, status=status.HTTP_200_OK)
 
     @extend_schema(request=OpenApiTypes.NONE)
     @action(detail=True, methods=["POST"])
     def deactivate(self, request, pk=None):
-        alert: Alert = self.get_object()
-        alert.deactivate()
+        alert: Alert = get_object_or_404(self.get_toggle_queryset(), pk=pk)
+        Alert.objects.filter(pk=alert.pk).opt_out(request.user)
         return Response(AlertSerializer(alert).data, status=status.HTTP_200_OK)
 
+    def get_bulk_queryset(self, request):
+        serializer = AlertIDsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.get_toggle_queryset().filter(
+            pk__in=serializer.validated_data["ids"]
+        )
+
+    @extend_schema(
+        request=AlertIDsSerializer,
+        responses={200: BulkUpdateResultSerializer},
+    )
+    @action(detail=False, methods=["POST"], url_path="bulk-activate")
+    def bulk_activate(self, request):
+        updated = self.get_bulk_queryset(request).opt_in(request.user)
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        request=AlertIDsSerializer,
+        responses={200: BulkUpdateResultSerializer},
+    )
+    @action(detail=False, methods=["POST"], url_path="bulk-deactivate")
+    def bulk_deactivate(self, request):
+        updated = self.get_bulk_queryset(request).opt_out(request.user)
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
+
 
 @extend_schema_view(
     get_settings=extend_schema(
@@ -140,7 +196,8 @@ class AlertViewSet(
     ),
     update_settings=extend_schema(
         summary="Update alert settings of logged in student",
-        description="Update alert settings of logged in student",
+        description="Update alert settings of logged in student. PATCH updates only "
+        "the given settings.",
     ),
 )
 @extend_schema(tags=["Alert Settings"])
@@ -161,10 +218,30 @@ class AlertSettingsViewSet(viewsets.GenericViewSet):
             AlertSettingsSerializer(alert_settings).data, status=status.HTTP_200_OK
         )
 
-    @action(detail=False, methods=["PUT"])
+    @action(detail=False, methods=["PUT", "PATCH"])
     def update_settings(self, request):
         alert_settings = self.get_object()
-        serializer = self.get_serializer(alert_settings, data=request.data)
+        serializer = self.get_serializer(
+            alert_settings, data=request.data, partial=request.method == "PATCH"
+        )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Expose the alert dispatch metrics in the Prometheus text format to scrapers
+    presenting the ALERT_METRICS_TOKEN as a bearer token. The endpoint is disabled
+    when no token is configured.
+    """
+    token = django_settings.ALERT_METRICS_TOKEN
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    if (
+        not token
+        or scheme.lower() != "bearer"
+        or not hmac.compare_digest(credentials.encode(), token.encode())
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.collect(), content_type=CONTENT_TYPE_LATEST)
@@ -10,7 +10,10 @@ class UserAdmin(admin.ModelAdmin):
     ordering = ["email", "matric_number", "level"]
     readonly_fields = ["last_login", "date_joined"]
     fieldsets = (
-        (None, {"fields": ("email", "matric_number", "level", "password")}),
+        (
+            None,
+            {"fields": ("email", "matric_number", "level", "phone_number", "password")},
+        ),
         (
             "Permissions",
             {
@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
+from .cache import get_session_user, set_session_user
 from .models import Session
 
 User = get_user_model()
@@ -16,12 +17,20 @@ class SessionAuthentication(BaseAuthentication):
         if not session_token or not user_id:
             return None
 
-        try:
-            session = Session.objects.get(
-                token=session_token, user_id=user_id, is_current=True
-            )
+        # The user of a current token is cached until logout, so that
+        # authenticating doesn't hit the database
+        user = get_session_user(session_token)
+        if user is None:
+            try:
+                session = Session.objects.select_related("user").get(
+                    token=session_token, is_current=True
+                )
+            except Session.DoesNotExist:
+                raise AuthenticationFailed("Invalid session or expired session.")
             user = session.user
-        except Session.DoesNotExist:
+            set_session_user(session_token, user)
+
+        if user.pk != user_id:
             raise AuthenticationFailed("Invalid session or expired session.")
 
         return (user, None)
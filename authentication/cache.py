@@ -0,0 +1,124 @@
+import copy
+import threading
+import time
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+
+from lecture_management_system.utils import log
+
+# Users of the session tokens, by token. Each process keeps the tokens it used
+# recently for a few seconds, in front of the shared cache.
+SESSION_USER_KEY = "auth:session:{token}"
+# Tokens revoked by a logout or a new login. A request that looked the session up
+# before the revocation may still cache its user afterwards, the marker keeps that
+# entry from being served.
+REVOKED_TOKEN_KEY = "auth:session:revoked:{token}"
+LOCAL_CACHE_MAX_SIZE = 1024
+
+# Requests are served from a thread pool, so the local cache is only used under the
+# lock
+_local_users: dict[str, tuple[float, object]] = {}
+_local_users_lock = threading.Lock()
+
+
+def get_session_user(token: str):
+    """
+    Get the user of a current session token from the cache
+
+    Returns:
+    User | None: A copy of the cached user, or None if the token isn't cached
+    """
+    now = time.monotonic()
+    with _local_users_lock:
+        entry = _local_users.get(token)
+        if entry is not None and entry[0] <= now:
+            del _local_users[token]
+            entry = None
+    if entry is not None:
+        # Views may modify request.user, so each request gets its own copy
+        return copy.deepcopy(entry[1])
+
+    user_key = SESSION_USER_KEY.format(token=token)
+    revoked_key = REVOKED_TOKEN_KEY.format(token=token)
+    try:
+        values = cache.get_many([user_key, revoked_key])
+    except Exception as e:
+        log.warning(f"Failed to read the session cache: {e}")
+        return None
+    user = values.get(user_key)
+    if user is None or revoked_key in values:
+        return None
+    remember_locally(token, user, now)
+    return user
+
+
+def set_session_user(token: str, user):
+    """
+    Cache the user of a current session token
+    """
+    try:
+        cache.set(
+            SESSION_USER_KEY.format(token=token),
+            user,
+            timeout=django_settings.SESSION_TOKEN_CACHE_TIMEOUT,
+        )
+    except Exception as e:
+        log.warning(f"Failed to write the session cache: {e}")
+    remember_locally(token, user, time.monotonic())
+    # The token may have been revoked since its session was looked up. Revoking
+    # marks it before dropping it locally, so checking the marker after
+    # remembering it leaves no window for it to stay cached.
+    try:
+        revoked = cache.get(REVOKED_TOKEN_KEY.format(token=token)) is not None
+    except Exception as e:
+        log.warning(f"Failed to read the session cache: {e}")
+        revoked = True
+    if revoked:
+        with _local_users_lock:
+            _local_users.pop(token, None)
+
+
+def remember_locally(token: str, user, now: float):
+    entry = (
+        now + django_settings.SESSION_TOKEN_LOCAL_CACHE_TIMEOUT,
+        copy.deepcopy(user),
+    )
+    with _local_users_lock:
+        if token not in _local_users and len(_local_users) >= LOCAL_CACHE_MAX_SIZE:
+            # Evict the oldest token
+            del _local_users[next(iter(_local_users))]
+        _local_users[token] = entry
+
+
+def invalidate_session_tokens(*tokens: str):
+    """
+    Drop session tokens from the cache, e.g. when their user changes. Other
+    processes may keep accepting them for up to SESSION_TOKEN_LOCAL_CACHE_TIMEOUT
+    seconds.
+    """
+    with _local_users_lock:
+        for token in tokens:
+            _local_users.pop(token, None)
+    try:
+        cache.delete_many([SESSION_USER_KEY.format(token=token) for token in tokens])
+    except Exception as e:
+        log.warning(f"Failed to invalidate the session cache: {e}")
+
+
+def revoke_session_tokens(*tokens: str):
+    """
+    Revoke session tokens that are no longer current, e.g. on logout, so that no
+    request caches their user again
+    """
+    if not tokens:
+        return
+    try:
+        # Outlive the entries of requests that looked the tokens up before
+        cache.set_many(
+            {REVOKED_TOKEN_KEY.format(token=token): True for token in tokens},
+            timeout=2 * django_settings.SESSION_TOKEN_CACHE_TIMEOUT,
+        )
+    except Exception as e:
+        log.warning(f"Failed to revoke the session tokens: {e}")
+    invalidate_session_tokens(*tokens)
@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-17 17:55
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="phone_number",
+            field=models.CharField(
+                blank=True,
+                max_length=16,
+                null=True,
+                validators=[
+                    django.core.validators.RegexValidator(
+                        "^\\+[1-9][0-9]{6,14}$",
+                        message="The Phone Number is not valid, it should be in the international format '+2348012345678'",
+                    )
+                ],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="session",
+            name="token",
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
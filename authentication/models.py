@@ -91,6 +91,17 @@ class User(AbstractBaseUser):
         blank=True,
         choices=Level.choices,
     )
+    phone_number = models.CharField(
+        max_length=16,
+        null=True,
+        blank=True,
+        validators=[
+            RegexValidator(
+                r"^\+[1-9][0-9]{6,14}$",
+                message="The Phone Number is not valid, it should be in the international format '+2348012345678'",
+            )
+        ],
+    )
     is_lecturer = models.BooleanField(default=False)
     is_class_rep = models.BooleanField(default=False)
     is_registration_officer = models.BooleanField(default=False)
@@ -126,7 +137,8 @@ class User(AbstractBaseUser):
 
 class Session(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    token = models.CharField(max_length=255)
+    # Looked up when authenticating requests whose token isn't cached
+    token = models.CharField(max_length=255, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_first_login = models.BooleanField(default=True)
     is_current = models.BooleanField(default=False)
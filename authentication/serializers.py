@@ -8,7 +8,7 @@ from drf_spectacular.utils import extend_schema_field
 
 from rest_framework import serializers
 
-from courses.models import Course
+from courses.models import COURSE_ORDERING, Course
 
 from .models import Session
 
@@ -72,11 +72,15 @@ class LecturerSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(LecturerCourseSerializer(many=True))
     def get_courses(self, obj) -> list[dict[str, Any]]:
-        return LecturerCourseSerializer(obj.lecturer_courses.all(), many=True).data
+        return LecturerCourseSerializer(
+            obj.lecturer_courses.order_by(*COURSE_ORDERING), many=True
+        ).data
 
     @extend_schema_field(LecturerCourseSerializer(many=True))
     def get_assisted_courses(self, obj) -> list[dict[str, Any]]:
-        return LecturerCourseSerializer(obj.assisted_courses.all(), many=True).data
+        return LecturerCourseSerializer(
+            obj.assisted_courses.order_by(*COURSE_ORDERING), many=True
+        ).data
 
     def validate_email(self, value: str) -> str:
         if User.objects.filter(email=value).exists():
@@ -101,6 +105,7 @@ class StudentSerializer(serializers.ModelSerializer):
             "password",
             "matric_number",
             "level",
+            "phone_number",
             "is_lecturer",
             "is_class_rep",
         ]
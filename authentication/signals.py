@@ -1,31 +1,52 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from .cache import invalidate_session_tokens
+from .models import Session
+
 User = get_user_model()
 
 
 @receiver(post_save, sender=User)
-def create_alert(sender, instance, **kwargs):
+def create_alert(sender, instance, created, **kwargs):
     from alarm.models import Alert, Course, AlertSettings
 
+    # Only new users need setting up, later saves (e.g. last_login) change nothing
+    if not created:
+        return
+
     # Create an alert setting for the user
-    alert_settings, created = AlertSettings.objects.get_or_create(student=instance)
-    if created:
-        alert_settings.save()
+    AlertSettings.objects.get_or_create(student=instance)
 
-    # Create an alert for the user if they are a student for all courses
+    # Make sure every course has an alert, students are part of the audience of the
+    # alerts of their level without being attached to them
     if not instance.is_lecturer:
-        courses = Course.objects.all()
-        for course in courses:
-            alert, created = Alert.objects.get_or_create(
-                event=course,
-                defaults={
-                    "title": f"{course.code} - {course.name}",
-                    "description": f"Your {course.code} - {course.name} is starting soon",
-                },
-            )
-            if created:
-                alert.students.add(instance)
-            elif not alert.students.filter(id=instance.id).exists():
-                alert.students.add(instance)
+        Alert.objects.create_for_courses(Course.objects.all())
+
+
+# Fields saved without changing what the session cache serves
+UNCACHED_USER_FIELDS = frozenset({"last_login"})
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_sessions(
+    sender, instance, created=False, update_fields=None, **kwargs
+):
+    # Authenticated requests get the user from the session cache, which must not
+    # serve it once it changed, e.g. its level or roles. Logging in only updates
+    # last_login, which doesn't need its sessions looked up.
+    if created or (update_fields and update_fields <= UNCACHED_USER_FIELDS):
+        return
+    tokens = list(
+        Session.objects.filter(user_id=instance.pk).values_list("token", flat=True)
+    )
+    if tokens:
+        invalidate_session_tokens(*tokens)
+
+
+@receiver(post_save, sender=Session)
+@receiver(post_delete, sender=Session)
+def invalidate_session(sender, instance, **kwargs):
+    invalidate_session_tokens(instance.token)
@@ -0,0 +1,14 @@
+from .models import Session
+
+
+def log_in(client, user) -> None:
+    """
+    Give a test client a current session of the user, as logging in does
+    """
+    session = Session.objects.create(
+        user=user, token=f"token-{user.pk}", is_current=True
+    )
+    client_session = client.session
+    client_session["session_token"] = session.token
+    client_session["user_id"] = user.pk
+    client_session.save()
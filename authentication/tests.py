@@ -1,3 +1,68 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from django.test import TestCase
+from django.utils import timezone
+
+from . import cache
+from .models import Session
+
+User = get_user_model()
+
+
+class SessionCacheTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.user = User.objects.create(
+            email="student@example.com", matric_number="ABC/01/0001", level=100
+        )
+        self.session = Session.objects.create(
+            user=self.user, token="token", is_current=True
+        )
+        cache.set_session_user(self.session.token, self.user)
+
+    def test_login_keeps_sessions_cached(self):
+        self.user.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=["last_login"])
+        self.assertIsNotNone(cache.get_session_user(self.session.token))
+
+    def test_changes_invalidate_sessions(self):
+        self.user.level = 200
+        self.user.save(update_fields=["level"])
+        self.assertIsNone(cache.get_session_user(self.session.token))
+
+    def test_revoked_token_not_cached_again(self):
+        # A request looked the session up before the logout revoked its token, and
+        # caches its user after it
+        cache.revoke_session_tokens(self.session.token)
+        cache.set_session_user(self.session.token, self.user)
+        self.assertIsNone(cache.get_session_user(self.session.token))
+        self.assertNotIn(self.session.token, cache._local_users)
+
+    def test_concurrent_local_cache_use(self):
+        errors = []
+
+        def use_tokens(thread: int):
+            try:
+                for index in range(500):
+                    token = f"token-{thread}-{index}"
+                    cache.remember_locally(token, self.user, 0)
+                    cache.get_session_user(token)
+                    cache.invalidate_session_tokens(token)
+            except Exception as e:
+                errors.append(e)
 
-# Create your tests here.
+        with mock.patch.object(cache, "LOCAL_CACHE_MAX_SIZE", 8):
+            threads = [
+                threading.Thread(target=use_tokens, args=(thread,))
+                for thread in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(cache._local_users), 8)
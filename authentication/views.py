@@ -15,6 +15,7 @@ from rest_framework import viewsets, status, permissions, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from .cache import revoke_session_tokens
 from .models import Session, User
 from .permissions import IsLecturer, IsClassRep, IsRegistrationOfficer
 from .serializers import (
@@ -66,9 +67,12 @@ class AuthViewSet(viewsets.GenericViewSet):
             )
         login(request, user)
 
-        # Create or update the session
+        # Create or update the session, the previous token of the user is replaced
         session_token = str(uuid.uuid4())
-        is_first_login = not Session.objects.filter(user=user).exists()
+        previous_tokens = list(
+            Session.objects.filter(user=user).values_list("token", flat=True)
+        )
+        is_first_login = not previous_tokens
 
         custom_session, _ = Session.objects.update_or_create(
             user=user,
@@ -79,6 +83,8 @@ class AuthViewSet(viewsets.GenericViewSet):
             },
         )
 
+        revoke_session_tokens(*previous_tokens)
+
         # Store session token in the request session
         request.session["session_token"] = session_token
         request.session["user_id"] = user.pk
@@ -97,9 +103,10 @@ class AuthViewSet(viewsets.GenericViewSet):
         Logout a user and invalidate the current session.
         """
         # Invalidate current session
-        Session.objects.filter(user=request.user, is_current=True).update(
-            is_current=False
-        )
+        sessions = Session.objects.filter(user=request.user, is_current=True)
+        tokens = list(sessions.values_list("token", flat=True))
+        sessions.update(is_current=False)
+        revoke_session_tokens(*tokens)
 
         # Clear session token from the request session
         logout(request)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Course
+from .models import COURSE_ORDERING, Course, CourseTag
 
 
 # Register your models here.
@@ -16,4 +16,14 @@ class CourseAdmin(admin.ModelAdmin):
         "end_time",
     ]
     list_filter = ["level", "day", "lecturer"]
-    search_fields = ["code", "name", "lecturer__username"]
+    search_fields = ["code", "name", "lecturer__email"]
+    ordering = COURSE_ORDERING
+
+
+@admin.register(CourseTag)
+class CourseTagAdmin(admin.ModelAdmin):
+    list_display = ["student", "course", "tag", "created_at"]
+    list_filter = ["tag", "course__level"]
+    search_fields = ["student__matric_number", "student__email", "course__code"]
+    list_select_related = ["student", "course"]
+    autocomplete_fields = ["student", "course"]
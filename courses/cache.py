@@ -0,0 +1,128 @@
+import hashlib
+from datetime import datetime
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .timetable import build_weekly_timetable
+
+# Cached data is keyed by a per-level version, so invalidating the timetables of a
+# level is a single increment and stale entries simply expire. Versions start from
+# the current time in milliseconds, so that a version lost with the cache is never
+# reused for different data. The version and modification time of a level also
+# serve as the ETag and Last-Modified of its courses.
+VERSION_KEY = "courses:timetable:version:{level}"
+MODIFIED_KEY = "courses:timetable:modified:{level}"
+TIMETABLE_KEY = "courses:timetable:{level}:{version}"
+# Modification time of the course tags of a student, which only affect their own
+# timetable
+TAGS_MODIFIED_KEY = "courses:tags:modified:{student}"
+
+
+def get_timetable_stamps(*levels: int) -> dict[int, tuple[int, datetime]]:
+    """
+    Get the version and modification time of the timetables of the given levels
+
+    Returns:
+    dict[int, tuple[int, datetime]]: The version and modification time by level
+    """
+    keys = {
+        level: (VERSION_KEY.format(level=level), MODIFIED_KEY.format(level=level))
+        for level in set(levels)
+    }
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+
+    stamps = {}
+    for level, (version_key, modified_key) in keys.items():
+        if version_key not in values or modified_key not in values:
+            # Start a new series of versions for a level that lost its stamps
+            now = timezone.now()
+            cache.add(version_key, int(now.timestamp() * 1000), timeout=None)
+            cache.add(modified_key, now, timeout=None)
+            values.update(cache.get_many([version_key, modified_key]))
+        stamps[level] = (values[version_key], values[modified_key])
+    return stamps
+
+
+def touch_course_tags(*students: int):
+    """
+    Record that the course tags of the given students changed
+    """
+    now = timezone.now()
+    cache.set_many(
+        {TAGS_MODIFIED_KEY.format(student=student): now for student in students},
+        timeout=None,
+    )
+
+
+def get_timetable_validators(
+    level: int,
+    special_courses: dict[int, tuple[str, int]] | None = None,
+    student: int | None = None,
+) -> tuple[str, datetime, int]:
+    """
+    Get the ETag and Last-Modified of the timetable of a level, adjusted to the
+    special courses of a student if given, without reading the courses. The version
+    of the timetable they were derived from is returned too, for the body to be read
+    at that same version.
+
+    Args:
+    level (int): The level of the timetable
+    special_courses (dict): The tag and level of the special courses of the
+    student, by course ID
+    student (int): The ID of the student, whose tag changes then count as
+    modifications
+
+    Returns:
+    tuple[str, datetime, int]: The ETag, unquoted, the modification time and the
+    version of the timetable of the level
+    """
+    special_courses = special_courses or {}
+    levels = {level, *(course_level for _, course_level in special_courses.values())}
+    stamps = get_timetable_stamps(*levels)
+
+    parts = [f"{level}.{stamps[level][0]}"]
+    parts.extend(
+        f"{course_level}.{stamps[course_level][0]}"
+        for course_level in sorted(levels - {level})
+    )
+    parts.extend(
+        f"{course_id}{tag}" for course_id, (tag, _) in sorted(special_courses.items())
+    )
+    etag = "-".join(parts)
+    if len(etag) > 64:
+        etag = hashlib.md5(etag.encode(), usedforsecurity=False).hexdigest()
+    last_modified = max(modified for _, modified in stamps.values())
+    if student is not None:
+        key = TAGS_MODIFIED_KEY.format(student=student)
+        cache.add(key, timezone.now(), timeout=None)
+        last_modified = max(last_modified, cache.get(key, last_modified))
+    return etag, last_modified, stamps[level][0]
+
+
+def invalidate_timetable(*levels: int):
+    """
+    Invalidate the cached weekly timetables of the given levels
+    """
+    now = timezone.now()
+    for level in set(levels):
+        key = VERSION_KEY.format(level=level)
+        cache.add(key, int(now.timestamp() * 1000), timeout=None)
+        cache.incr(key)
+        cache.set(MODIFIED_KEY.format(level=level), now, timeout=None)
+
+
+def get_weekly_timetable(level: int, version: int) -> list[dict]:
+    """
+    Get the serialized weekly timetable of a level at the given version, as returned
+    with its validators, from the cache when possible
+    """
+    key = TIMETABLE_KEY.format(level=level, version=version)
+    timetable = cache.get(key)
+    if timetable is None:
+        timetable = build_weekly_timetable(level)
+        cache.set(
+            key, timetable, timeout=django_settings.COURSE_TIMETABLE_CACHE_TIMEOUT
+        )
+    return timetable
@@ -0,0 +1,156 @@
+import heapq
+from bisect import bisect_left
+from datetime import time
+from typing import Iterable, NamedTuple
+
+from django.db import models
+
+from .models import Course
+
+# Course fields that can't be booked twice at the same time
+CLASH_RESOURCES = ("venue", "lecturer_id", "level")
+INDEX_FIELDS = ("id", "code", "day", "start_time", "end_time", *CLASH_RESOURCES)
+
+
+class Clash(NamedTuple):
+    resource: str
+    value: object
+    day: str
+    course_id: int
+    other_course_id: int
+
+
+RESOURCE_LABELS = {"venue": "venue", "lecturer_id": "lecturer", "level": "level"}
+
+
+def describe_clash(clash: Clash) -> str:
+    return (
+        f"The {RESOURCE_LABELS[clash.resource]} is already booked on {clash.day} "
+        f"by course {clash.other_course_id}"
+    )
+
+
+def find_clashes(course: Course) -> list[Clash]:
+    """
+    Find the courses double-booking the venue, lecturer or level of a course being
+    created or updated. Each lookup is a range scan on the (resource, day,
+    start_time) indexes of the courses.
+
+    Returns:
+    list[Clash]: The clashes of the course, by resource
+    """
+    overlapping = (
+        Course.objects.filter(
+            day=course.day,
+            start_time__lt=course.end_time,
+            end_time__gt=course.start_time,
+        )
+        .filter(
+            models.Q(venue=course.venue)
+            | models.Q(lecturer_id=course.lecturer_id)
+            | models.Q(level=course.level)
+        )
+        .values(*INDEX_FIELDS)
+    )
+    if course.pk is not None:
+        overlapping = overlapping.exclude(pk=course.pk)
+
+    return [
+        Clash(resource, getattr(course, resource), course.day, course.pk, other["id"])
+        for other in overlapping
+        for resource in CLASH_RESOURCES
+        if other[resource] == getattr(course, resource)
+    ]
+
+
+class TimetableIndex:
+    """
+    In-memory interval index of a timetable. The courses are kept, for each day
+    and each venue, lecturer and level, in lists sorted by start time with the
+    running maximum of their end times, so that the courses overlapping an interval
+    are found with a binary search.
+    """
+
+    def __init__(self, courses: Iterable[dict]):
+        buckets: dict[tuple, list[tuple[time, time, int]]] = {}
+        self.courses: dict[int, dict] = {}
+        for course in courses:
+            self.courses[course["id"]] = course
+            for resource in CLASH_RESOURCES:
+                key = (resource, course[resource], course["day"])
+                buckets.setdefault(key, []).append(
+                    (course["start_time"], course["end_time"], course["id"])
+                )
+
+        self.starts: dict[tuple, list[time]] = {}
+        self.intervals: dict[tuple, list[tuple[time, time, int]]] = {}
+        self.max_ends: dict[tuple, list[time]] = {}
+        for key, intervals in buckets.items():
+            intervals.sort()
+            max_ends, max_end = [], time.min
+            for _, end, _ in intervals:
+                max_end = max(max_end, end)
+                max_ends.append(max_end)
+            self.intervals[key] = intervals
+            self.starts[key] = [start for start, _, _ in intervals]
+            self.max_ends[key] = max_ends
+
+    @classmethod
+    def from_queryset(cls, courses: models.QuerySet) -> "TimetableIndex":
+        return cls(courses.values(*INDEX_FIELDS).iterator(chunk_size=2000))
+
+    def overlapping(
+        self, resource: str, value, day: str, start_time: time, end_time: time
+    ) -> list[int]:
+        """
+        Get the IDs of the courses booking a resource during [start_time, end_time)
+        """
+        key = (resource, value, day)
+        if key not in self.intervals:
+            return []
+
+        intervals, max_ends = self.intervals[key], self.max_ends[key]
+        # Only the courses starting before the end of the interval can overlap it,
+        # and none of them once the running maximum end is before its start
+        index = bisect_left(self.starts[key], end_time) - 1
+        course_ids = []
+        while index >= 0 and max_ends[index] > start_time:
+            _, end, course_id = intervals[index]
+            if end > start_time:
+                course_ids.append(course_id)
+            index -= 1
+        return course_ids
+
+    def find_clashes(self, course: dict) -> list[Clash]:
+        """
+        Find the indexed courses clashing with a course, which may not be indexed
+        """
+        return [
+            Clash(resource, course[resource], course["day"], course.get("id"), other)
+            for resource in CLASH_RESOURCES
+            for other in self.overlapping(
+                resource,
+                course[resource],
+                course["day"],
+                course["start_time"],
+                course["end_time"],
+            )
+            if other != course.get("id")
+        ]
+
+    def clashes(self) -> list[Clash]:
+        """
+        Find every clash of the timetable with a sweep over each sorted list, in
+        O(n log n) plus the number of clashes
+        """
+        clashes = []
+        for (resource, value, day), intervals in self.intervals.items():
+            # Courses still running at the start of the current one, by end time
+            running: list[tuple[time, int]] = []
+            for start, end, course_id in intervals:
+                while running and running[0][0] <= start:
+                    heapq.heappop(running)
+                for _, other_id in running:
+                    clashes.append(Clash(resource, value, day, other_id, course_id))
+                heapq.heappush(running, (end, course_id))
+        return clashes
@@ -0,0 +1,14 @@
+from django_filters import rest_framework as filters
+
+from .models import Course
+
+
+class CourseFilter(filters.FilterSet):
+    class Meta:
+        model = Course
+        fields = {
+            "level": ["exact"],
+            "day": ["exact"],
+            "lecturer": ["exact"],
+            "venue": ["exact", "icontains"],
+        }
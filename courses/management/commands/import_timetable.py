@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.spreadsheets import (
+    FILE_FORMATS,
+    TimetableImportError,
+    get_file_format,
+    import_timetable,
+)
+
+
+class Command(BaseCommand):
+    help = "Import the courses of a timetable CSV or XLSX file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path of the timetable file")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=FILE_FORMATS,
+            help="Format of the file, guessed from its extension by default",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            file_format = get_file_format(path, options["file_format"])
+            with open(path, "rb") as file:
+                result = import_timetable(file, file_format)
+        except TimetableImportError as e:
+            for error in e.errors:
+                prefix = f"Row {error['row']}: " if error["row"] else ""
+                self.stderr.write(prefix + "; ".join(error["errors"]))
+            raise CommandError(str(e))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported timetable: {result['created']} courses created, "
+                f"{result['updated']} updated"
+            )
+        )
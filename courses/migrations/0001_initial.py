@@ -0,0 +1,135 @@
+# Generated by Django 5.1 on 2026-10-17 17:54
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Course",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                (
+                    "code",
+                    models.CharField(
+                        max_length=6,
+                        validators=[
+                            django.core.validators.RegexValidator(
+                                "[A-Z]{3}[0-9]{3}",
+                                message="The code must be in the format ABC123",
+                            )
+                        ],
+                    ),
+                ),
+                (
+                    "level",
+                    models.PositiveIntegerField(
+                        choices=[
+                            (100, "Level 100"),
+                            (200, "Level 200"),
+                            (300, "Level 300"),
+                            (400, "Level 400"),
+                            (500, "Level 500"),
+                        ]
+                    ),
+                ),
+                (
+                    "day",
+                    models.CharField(
+                        choices=[
+                            ("MON", "Monday"),
+                            ("TUE", "Tuesday"),
+                            ("WED", "Wednesday"),
+                            ("THU", "Thursday"),
+                            ("FRI", "Friday"),
+                            ("SAT", "Saturday"),
+                            ("SUN", "Sunday"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("venue", models.CharField(max_length=100)),
+                ("start_time", models.TimeField()),
+                ("end_time", models.TimeField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "assistants",
+                    models.ManyToManyField(
+                        blank=True,
+                        limit_choices_to={"is_lecturer": True},
+                        related_name="assisted_courses",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "lecturer",
+                    models.ForeignKey(
+                        limit_choices_to={"is_lecturer": True},
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lecturer_courses",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["name", "code", "level", "day", "start_time"],
+            },
+        ),
+        migrations.CreateModel(
+            name="SpecialCourse",
+            fields=[
+                (
+                    "tag",
+                    models.CharField(
+                        choices=[("CO", "Carry Over"), ("SO", "Spill Over")],
+                        max_length=100,
+                    ),
+                ),
+                (
+                    "base_course",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        parent_link=True,
+                        primary_key=True,
+                        related_name="special_course",
+                        serialize=False,
+                        to="courses.course",
+                    ),
+                ),
+                (
+                    "students",
+                    models.ManyToManyField(
+                        limit_choices_to={"is_lecturer": False},
+                        related_name="special_courses",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Special Course",
+                "verbose_name_plural": "Special Courses",
+                "ordering": ["name", "code", "level", "day", "start_time"],
+            },
+            bases=("courses.course",),
+        ),
+    ]
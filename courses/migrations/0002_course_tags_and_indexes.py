@@ -0,0 +1,140 @@
+# Generated by Django 5.1 on 2026-10-17 17:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CourseTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.CharField(
+                        choices=[("CO", "Carry Over"), ("SO", "Spill Over")],
+                        max_length=2,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Course Tag",
+                "verbose_name_plural": "Course Tags",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="course",
+            options={},
+        ),
+        migrations.AlterField(
+            model_name="course",
+            name="lecturer",
+            field=models.ForeignKey(
+                db_index=False,
+                limit_choices_to={"is_lecturer": True},
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="lecturer_courses",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["venue", "day", "start_time"], name="course_venue_slot_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["lecturer", "day", "start_time"],
+                name="course_lecturer_slot_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["level", "day", "start_time"], name="course_level_slot_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(fields=["name", "id"], name="course_name_id_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="course",
+            constraint=models.UniqueConstraint(
+                fields=("code", "day", "start_time"), name="course_unique_slot"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="course",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("start_time__lt", models.F("end_time"))),
+                name="course_start_before_end",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="course",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    ("day__in", ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"])
+                ),
+                name="course_valid_day",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="course",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("level__in", [100, 200, 300, 400, 500])),
+                name="course_valid_level",
+            ),
+        ),
+        migrations.AddField(
+            model_name="coursetag",
+            name="course",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="student_tags",
+                to="courses.course",
+            ),
+        ),
+        migrations.AddField(
+            model_name="coursetag",
+            name="student",
+            field=models.ForeignKey(
+                limit_choices_to={"is_lecturer": False},
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="course_tags",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="coursetag",
+            index=models.Index(
+                fields=["course", "tag", "student"], name="course_tag_course_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="coursetag",
+            constraint=models.UniqueConstraint(
+                fields=("student", "course"), name="course_tag_unique_student_course"
+            ),
+        ),
+    ]
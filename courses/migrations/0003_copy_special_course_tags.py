@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def copy_special_course_tags(apps, schema_editor):
+    """
+    Copy the tags of the students of each special course to the course tags. A
+    special course was shared by the students tagging it, with a single tag.
+    """
+    SpecialCourse = apps.get_model("courses", "SpecialCourse")
+    CourseTag = apps.get_model("courses", "CourseTag")
+
+    CourseTag.objects.bulk_create(
+        [
+            CourseTag(student_id=student_id, course_id=course_id, tag=tag)
+            for course_id, student_id, tag in SpecialCourse.students.through.objects.values_list(
+                "specialcourse_id", "user_id", "specialcourse__tag"
+            ).iterator(
+                chunk_size=2000
+            )
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0002_course_tags_and_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_special_course_tags, migrations.RunPython.noop),
+    ]
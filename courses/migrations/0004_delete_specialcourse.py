@@ -0,0 +1,14 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0003_copy_special_course_tags"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="SpecialCourse",
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import DEFERRED
 from django.utils.translation import gettext_lazy as _
 
 from authentication.models import Level
@@ -18,6 +20,27 @@ class DayOfWeek(models.TextChoices):
     SUNDAY = "SUN", _("Sunday")
 
 
+# Order in which courses are listed. There is no default ordering, so that only the
+# queries that need an order pay for the sort.
+COURSE_ORDERING = ("name", "code", "level", "day", "start_time")
+
+
+class CourseQuerySet(models.QuerySet):
+    def for_student(self, student):
+        """
+        Get the effective courses of a student: the courses of their level they
+        haven't carried over and the courses they spill over to
+        """
+        tags = CourseTag.objects.filter(
+            course_id=models.OuterRef("pk"), student_id=student.pk
+        )
+        carried_over = models.Exists(tags.filter(tag=Tag.CARRY_OVER))
+        spilled_over = models.Exists(tags.filter(tag=Tag.SPILL_OVER))
+        return self.filter(
+            (models.Q(level=student.level) & ~carried_over) | spilled_over
+        )
+
+
 # Create your models here.
 class Course(models.Model):
     # Course details
@@ -38,6 +61,8 @@ class Course(models.Model):
         on_delete=models.CASCADE,
         related_name="lecturer_courses",
         limit_choices_to={"is_lecturer": True},
+        # Covered by the (lecturer, day, start_time) index
+        db_index=False,
     )
     assistants = models.ManyToManyField(
         User,
@@ -54,16 +79,101 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
     updated_at = models.DateTimeField(auto_now=True, editable=False)
 
+    objects = CourseQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so that saves can tell which fields changed.
+        # Deferred fields weren't loaded, so they can't be compared.
+        instance._loaded_values = {
+            name: value
+            for name, value in zip(field_names, values)
+            if value is not DEFERRED
+        }
+        return instance
+
+    def get_changed_fields(self) -> set[str]:
+        """
+        Get the fields changed since the course was loaded from or saved to the
+        database. All fields are considered changed for a course that was never loaded,
+        and fields deferred when it was loaded are never considered changed.
+        """
+        loaded_values: dict | None = getattr(self, "_loaded_values", None)
+        if loaded_values is None:
+            return {field.attname for field in self._meta.concrete_fields}
+        return {
+            name
+            for name, value in loaded_values.items()
+            if getattr(self, name) != value
+        }
+
+    def clean(self):
+        from .clashes import describe_clash, find_clashes
+
+        super().clean()
+        if self.start_time is None or self.end_time is None:
+            return
+        if self.start_time >= self.end_time:
+            raise ValidationError(
+                {"end_time": "The end time must be after the start time"}
+            )
+        clashes = find_clashes(self)
+        if clashes:
+            raise ValidationError([describe_clash(clash) for clash in clashes])
+
     def save(self, *args, **kwargs):
         if self.start_time >= self.end_time:
             raise ValueError("The start time must be before the end time")
         super().save(*args, **kwargs)
+        deferred_fields = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred_fields
+        }
 
     class Meta:
-        ordering = ["name", "code", "level", "day", "start_time"]
+        constraints = [
+            # A course meets at several slots of the week, so its code alone isn't
+            # unique. This also identifies the courses of an imported timetable and
+            # serves the lookups by code.
+            models.UniqueConstraint(
+                fields=["code", "day", "start_time"], name="course_unique_slot"
+            ),
+            # Bulk imports and updates skip save(), the database enforces these
+            models.CheckConstraint(
+                condition=models.Q(start_time__lt=models.F("end_time")),
+                name="course_start_before_end",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(day__in=DayOfWeek.values),
+                name="course_valid_day",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(level__in=Level.values),
+                name="course_valid_level",
+            ),
+        ]
+        # Range scans for the courses booking a venue, lecturer or level on a day.
+        # Their prefixes serve the lookups by level, (level, day) and lecturer.
+        indexes = [
+            models.Index(
+                fields=["venue", "day", "start_time"], name="course_venue_slot_idx"
+            ),
+            models.Index(
+                fields=["lecturer", "day", "start_time"],
+                name="course_lecturer_slot_idx",
+            ),
+            models.Index(
+                fields=["level", "day", "start_time"], name="course_level_slot_idx"
+            ),
+            # Pages of the course list, which is ordered by name and ID
+            models.Index(fields=["name", "id"], name="course_name_id_idx"),
+        ]
 
 
 class Tag(models.TextChoices):
@@ -71,25 +181,82 @@ class Tag(models.TextChoices):
     SPILL_OVER = "SO", _("Spill Over")
 
 
-class SpecialCourse(Course):
-    tag = models.CharField(max_length=100, choices=Tag.choices)
-    students = models.ManyToManyField(
+class CourseTagQuerySet(models.QuerySet):
+    def tag(self, student, course_ids: list[int], tag: Tag) -> int:
+        """
+        Tag the given courses for a student with a single upsert, replacing their
+        previous tags
+
+        Returns:
+        int: The number of courses tagged
+        """
+        from .cache import touch_course_tags
+
+        tags = self.bulk_create(
+            [
+                CourseTag(student_id=student.pk, course_id=course_id, tag=tag)
+                for course_id in set(course_ids)
+            ],
+            update_conflicts=True,
+            unique_fields=["student", "course"],
+            update_fields=["tag"],
+        )
+        transaction.on_commit(lambda: touch_course_tags(student.pk))
+        return len(tags)
+
+    def untag(self, student, course_ids: list[int]) -> int:
+        """
+        Remove the tags of the given courses for a student
+
+        Returns:
+        int: The number of courses untagged
+        """
+        from .cache import touch_course_tags
+
+        deleted, _ = self.filter(
+            student_id=student.pk, course_id__in=course_ids
+        ).delete()
+        transaction.on_commit(lambda: touch_course_tags(student.pk))
+        return deleted
+
+
+class CourseTag(models.Model):
+    """
+    Tag of a course by a student: a course of their level they carry over, i.e.
+    don't take, or a course of another level they spill over to
+    """
+
+    student = models.ForeignKey(
         User,
-        related_name="special_courses",
+        on_delete=models.CASCADE,
+        related_name="course_tags",
         limit_choices_to={"is_lecturer": False},
     )
-    base_course = models.OneToOneField(
-        Course,
-        on_delete=models.CASCADE,
-        related_name="special_course",
-        parent_link=True,
-        primary_key=True,
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="student_tags"
     )
+    tag = models.CharField(max_length=2, choices=Tag.choices)
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+
+    objects = CourseTagQuerySet.as_manager()
 
     class Meta:
-        ordering = ["name", "code", "level", "day", "start_time"]
-        verbose_name = "Special Course"
-        verbose_name_plural = "Special Courses"
+        verbose_name = "Course Tag"
+        verbose_name_plural = "Course Tags"
+        constraints = [
+            # A student either carries over or spills over to a course, the index
+            # also serves the lookups of the tags of a student
+            models.UniqueConstraint(
+                fields=["student", "course"], name="course_tag_unique_student_course"
+            )
+        ]
+        # Lookups of the students tagging a course, e.g. to resolve the audience of
+        # its alerts
+        indexes = [
+            models.Index(
+                fields=["course", "tag", "student"], name="course_tag_course_idx"
+            )
+        ]
 
     def __str__(self):
-        return f"{self.code} - {self.name}"
+        return f"{self.student} - {self.course.code} ({self.get_tag_display()})"
@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CoursePagination(CursorPagination):
+    # The primary key breaks ties between courses with the same name
+    ordering = ("name", "id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class ClashPagination(PageNumberPagination):
+    # The clashes are computed in memory, so they are paged by number rather than
+    # by cursor
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 500
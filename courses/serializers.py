@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
-from .models import Course, DayOfWeek, Tag, SpecialCourse
+from .clashes import describe_clash, find_clashes
+from .models import Course, DayOfWeek, Tag
 from authentication.serializers import LecturerSerializer
 
 
@@ -10,7 +11,21 @@ class CourseLecturerSerializer(serializers.ModelSerializer):
         fields = ["id", "email", "is_lecturer", "is_registration_officer"]
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Lets the caller restrict the serialized fields with a `fields` argument, e.g.
+    from a `fields=id,code,name` query parameter. Unknown fields are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class CourseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     id = serializers.IntegerField(read_only=True)
     lecturer = CourseLecturerSerializer(read_only=True)
     assistants = CourseLecturerSerializer(many=True, read_only=True)
@@ -25,6 +40,26 @@ class CourseCreateSerializer(serializers.ModelSerializer):
         model = Course
         exclude = ["created_at", "updated_at"]
 
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+
+        # Check the schedule of the course as it will be saved
+        schedule = {
+            field: attrs.get(field, getattr(self.instance, field, None))
+            for field in ("day", "start_time", "end_time", "venue", "lecturer", "level")
+        }
+        if schedule["start_time"] >= schedule["end_time"]:
+            raise serializers.ValidationError(
+                {"end_time": "The end time must be after the start time"}
+            )
+        course = Course(pk=getattr(self.instance, "pk", None), **schedule)
+        clashes = find_clashes(course)
+        if clashes:
+            raise serializers.ValidationError(
+                {"clashes": [describe_clash(clash) for clash in clashes]}
+            )
+        return attrs
+
 
 class AssistantUpdateSerializer(serializers.Serializer):
     assistant = serializers.IntegerField()
@@ -43,3 +78,62 @@ class DayCourses:
 
 class SpecialCourseSerializer(CourseSerializer):
     tag = serializers.ChoiceField(choices=Tag.choices)
+
+
+class CourseIDsSerializer(serializers.Serializer):
+    courses = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+
+
+class CourseTagsSerializer(CourseIDsSerializer):
+    tag = serializers.ChoiceField(choices=Tag.choices)
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+
+        # Students carry over courses of their level and spill over to the others
+        student = self.context["request"].user
+        levels = dict(
+            Course.objects.filter(pk__in=attrs["courses"]).values_list("pk", "level")
+        )
+        errors = []
+        for course_id in attrs["courses"]:
+            if course_id not in levels:
+                errors.append(f"Course {course_id} does not exist")
+            elif attrs["tag"] == Tag.CARRY_OVER and levels[course_id] != student.level:
+                errors.append(f"Course {course_id} is not of your level")
+            elif attrs["tag"] == Tag.SPILL_OVER and levels[course_id] == student.level:
+                errors.append(f"Course {course_id} is already of your level")
+        if errors:
+            raise serializers.ValidationError({"courses": errors})
+        return attrs
+
+
+class CourseTagResultSerializer(serializers.Serializer):
+    updated = serializers.IntegerField(read_only=True)
+
+
+class TimetableImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    file_format = serializers.ChoiceField(choices=["csv", "xlsx"], required=False)
+
+
+class TimetableImportResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField(read_only=True)
+    updated = serializers.IntegerField(read_only=True)
+
+
+class ClashCourseSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    code = serializers.CharField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+
+class ClashSerializer(serializers.Serializer):
+    resource = serializers.ChoiceField(choices=["venue", "lecturer", "level"])
+    value = serializers.CharField()
+    day = serializers.ChoiceField(choices=DayOfWeek.choices)
+    course = ClashCourseSerializer()
+    other_course = ClashCourseSerializer()
@@ -1,34 +1,95 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from courses.models import Course
-
+from courses.cache import invalidate_timetable, touch_course_tags
+from courses.models import Course, CourseTag
 
 User = get_user_model()
 
+# Course fields the alert schedule is computed from
+ALERT_SCHEDULE_FIELDS = {"day", "start_time"}
+# User fields serialized with the lecturer and assistants of the courses of a
+# timetable
+TIMETABLE_USER_FIELDS = {"email", "is_lecturer", "is_registration_officer"}
+
 
 @receiver(post_save, sender=Course)
-def create_alert(sender, instance: Course, **kwargs):
+def create_alert(sender, instance: Course, created: bool, update_fields=None, **kwargs):
     from alarm.models import Alert
 
-    # Create an alert for the course for all students
-    students = User.objects.filter(is_lecturer=False)
+    if created:
+        # Create an alert for the course, its audience is resolved from the course
+        # level so no student needs to be attached to it
+        courses = Course.objects.filter(pk=instance.pk)
+        transaction.on_commit(lambda: Alert.objects.create_for_courses(courses))
+        return
 
-    # Check if the alert already exists
-    alert, created = Alert.objects.get_or_create(
-        event=instance,
-        defaults={
-            "title": f"{instance.code} - {instance.name}",
-            "description": f"Your {instance.code} - {instance.name} is starting soon",
-        },
-    )
+    changed_fields = instance.get_changed_fields()
+    if update_fields is not None:
+        changed_fields &= set(update_fields)
 
-    if created:
-        # If the alert was just created, add all students in bulk
-        alert.students.set(students)
+    # Edits to e.g. the venue or the assistants don't affect the alert
+    if changed_fields & ALERT_SCHEDULE_FIELDS:
+        alerts = Alert.objects.filter(event_id=instance.pk)
+        transaction.on_commit(alerts.sync_schedule)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_timetable(sender, instance: Course, **kwargs):
+    levels = [instance.level]
+    loaded_values: dict | None = getattr(instance, "_loaded_values", None)
+    if loaded_values and "level" in loaded_values:
+        # A course moved to another level leaves the timetable of its former level
+        levels.append(loaded_values["level"])
+    transaction.on_commit(lambda: invalidate_timetable(*levels))
+
+
+@receiver(m2m_changed, sender=Course.assistants.through)
+def invalidate_assistants_timetable(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if reverse:
+        # The courses of an assistant changed, their levels are affected
+        if action in ("post_add", "post_remove"):
+            courses = Course.objects.filter(pk__in=pk_set)
+        elif action == "pre_clear":
+            courses = Course.objects.filter(assistants=instance)
+        else:
+            return
+        levels = list(courses.values_list("level", flat=True).distinct())
+    elif action in ("post_add", "post_remove", "post_clear"):
+        levels = [instance.level]
     else:
-        # Otherwise, add any students who are not already associated with the alert
-        existing_students = alert.students.values_list("id", flat=True)
-        new_students = students.exclude(id__in=existing_students)
-        alert.students.add(*new_students)
+        return
+    transaction.on_commit(lambda: invalidate_timetable(*levels))
+
+
+@receiver(post_save, sender=User)
+def invalidate_lecturer_timetables(
+    sender, instance, created: bool, update_fields=None, **kwargs
+):
+    # New users have no courses yet, and e.g. logins don't change what timetables
+    # show about lecturers
+    if created or (update_fields and not TIMETABLE_USER_FIELDS & update_fields):
+        return
+    levels = list(
+        Course.objects.filter(
+            models.Q(lecturer=instance) | models.Q(assistants=instance)
+        )
+        .values_list("level", flat=True)
+        .distinct()
+    )
+    if levels:
+        transaction.on_commit(lambda: invalidate_timetable(*levels))
+
+
+@receiver(post_save, sender=CourseTag)
+@receiver(post_delete, sender=CourseTag)
+def touch_student_course_tags(sender, instance: CourseTag, **kwargs):
+    # Tags only change the timetable of their student, the cached timetable of
+    # the level stays valid. Bulk changes record it themselves.
+    student_id = instance.student_id
+    transaction.on_commit(lambda: touch_course_tags(student_id))
@@ -0,0 +1,331 @@
+import csv
+import zipfile
+from io import BytesIO
+from typing import IO, Iterator
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from openpyxl import Workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from authentication.models import Level
+
+from .cache import invalidate_timetable
+from .clashes import INDEX_FIELDS, RESOURCE_LABELS, TimetableIndex
+from .models import Course, DayOfWeek
+
+User = get_user_model()
+
+# Columns of a timetable file, the lecturer is identified by their email
+COLUMNS = (
+    "code",
+    "name",
+    "level",
+    "day",
+    "venue",
+    "start_time",
+    "end_time",
+    "lecturer",
+)
+# A course is identified by its code and slot, so re-importing a timetable
+# updates its courses instead of duplicating them
+NATURAL_KEY = ("code", "day", "start_time")
+# Fields compared by the clash checks, along with the code and name they make a course
+TIMETABLE_FIELDS = ("day", "start_time", "end_time", "venue", "lecturer_id", "level")
+UPDATE_FIELDS = ["name", "level", "lecturer", "venue", "end_time", "updated_at"]
+FILE_FORMATS = ("csv", "xlsx")
+IMPORT_BATCH_SIZE = 500
+
+
+class TimetableImportError(Exception):
+    """
+    Raised when a timetable file can't be imported
+
+    Args:
+    errors (list[dict]): The errors, each with the row (as numbered in the file,
+    the header being row 1) and its messages
+    """
+
+    def __init__(self, errors: list[dict]):
+        super().__init__(f"The timetable has {len(errors)} invalid rows")
+        self.errors = errors
+
+
+def get_file_format(file_name: str, file_format: str | None = None) -> str:
+    """
+    Get the format of a timetable file, from its extension unless given
+    """
+    file_format = (file_format or file_name.rsplit(".", 1)[-1]).lower()
+    if file_format not in FILE_FORMATS:
+        raise TimetableImportError(
+            [{"row": None, "errors": [f"Unsupported file format: {file_format}"]}]
+        )
+    return file_format
+
+
+def read_timetable(file: IO, file_format: str) -> pd.DataFrame:
+    """
+    Read a timetable file into a data frame of strings
+
+    Raises:
+    TimetableImportError: If the file can't be read in the given format
+    """
+    try:
+        if file_format == "csv":
+            frame = pd.read_csv(file, dtype=str, keep_default_na=False)
+        else:
+            frame = pd.read_excel(file, dtype=str, keep_default_na=False)
+    except (
+        pd.errors.ParserError,
+        ValueError,
+        zipfile.BadZipFile,
+        InvalidFileException,
+    ) as e:
+        raise TimetableImportError(
+            [{"row": None, "errors": [f"The file isn't a valid {file_format}: {e}"]}]
+        )
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+
+    missing = [column for column in COLUMNS if column not in frame.columns]
+    if missing:
+        raise TimetableImportError(
+            [{"row": 1, "errors": [f"Missing columns: {', '.join(missing)}"]}]
+        )
+    frame = frame[list(COLUMNS)].astype("string")
+    for column in COLUMNS:
+        frame[column] = frame[column].str.strip().replace("", pd.NA)
+    frame["code"] = frame["code"].str.upper()
+    frame["day"] = frame["day"].str.upper().str[:3]
+    # Number the rows as in the file
+    frame.index = frame.index + 2
+    return frame
+
+
+def parse_times(values: pd.Series) -> pd.Series:
+    """
+    Parse times written as HH:MM or HH:MM:SS, leaving invalid ones empty
+    """
+    parsed = pd.to_datetime(values, format="%H:%M:%S", errors="coerce")
+    parsed = parsed.fillna(pd.to_datetime(values, format="%H:%M", errors="coerce"))
+    return parsed.dt.time
+
+
+def validate_timetable(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Validate the rows of a timetable column by column and resolve their lecturers
+
+    Returns:
+    pd.DataFrame: The rows with typed values and a lecturer_id column
+
+    Raises:
+    TimetableImportError: If any row is invalid
+    """
+    frame = frame.copy()
+    frame["level"] = pd.to_numeric(frame["level"], errors="coerce")
+    frame["start_time"] = parse_times(frame["start_time"])
+    frame["end_time"] = parse_times(frame["end_time"])
+    lecturer_ids = dict(
+        User.objects.filter(
+            email__in=frame["lecturer"].dropna().unique().tolist(), is_lecturer=True
+        ).values_list("email", "id")
+    )
+    frame["lecturer_id"] = frame["lecturer"].map(lecturer_ids)
+
+    times_valid = frame["start_time"].notna() & frame["end_time"].notna()
+    checks = [
+        (frame[list(COLUMNS)].isna().any(axis=1), "All columns are required"),
+        (
+            ~frame["code"].str.fullmatch(r"[A-Z]{3}[0-9]{3}", na=False),
+            "The code must be in the format ABC123",
+        ),
+        (frame["name"].str.len() > 100, "The name must be at most 100 characters"),
+        (frame["venue"].str.len() > 100, "The venue must be at most 100 characters"),
+        (~frame["level"].isin(Level.values), "Invalid level value"),
+        (~frame["day"].isin(DayOfWeek.values), "Invalid day value"),
+        (~times_valid, "The times must be in the format HH:MM"),
+        (
+            times_valid & (frame["start_time"] >= frame["end_time"]),
+            "The end time must be after the start time",
+        ),
+        (frame["lecturer_id"].isna(), "Unknown lecturer"),
+        (
+            frame.duplicated(subset=list(NATURAL_KEY), keep=False),
+            "The course is listed more than once for this slot",
+        ),
+    ]
+    errors: dict[int, list[str]] = {}
+    for invalid, message in checks:
+        for row in frame.index[invalid.fillna(False)]:
+            errors.setdefault(int(row), []).append(message)
+    if errors:
+        raise TimetableImportError(
+            [{"row": row, "errors": errors[row]} for row in sorted(errors)]
+        )
+
+    frame["level"] = frame["level"].astype(int)
+    frame["lecturer_id"] = frame["lecturer_id"].astype(int)
+    return frame
+
+
+def get_records(frame: pd.DataFrame) -> list[dict]:
+    """
+    Get the courses of a validated timetable as dicts of Python values
+    """
+    return frame[["code", "name", *TIMETABLE_FIELDS]].to_dict("records")
+
+
+def check_clashes(
+    frame: pd.DataFrame, records: list[dict], existing_ids: dict[tuple, int]
+):
+    """
+    Check the imported courses for clashes between themselves and with the courses
+    they don't replace
+
+    Raises:
+    TimetableImportError: If any imported course clashes
+    """
+    # Imported rows are indexed under negative IDs to tell them from stored courses
+    rows = [{**record, "id": -int(row)} for row, record in zip(frame.index, records)]
+    # Only the stored courses booking an imported venue, lecturer or level on an
+    # imported day can clash
+    stored = (
+        Course.objects.filter(day__in={record["day"] for record in records})
+        .filter(
+            models.Q(venue__in={record["venue"] for record in records})
+            | models.Q(lecturer_id__in={record["lecturer_id"] for record in records})
+            | models.Q(level__in={record["level"] for record in records})
+        )
+        .exclude(pk__in=existing_ids.values())
+        .values(*INDEX_FIELDS)
+    )
+    index = TimetableIndex([*stored, *rows])
+
+    errors: dict[int, list[str]] = {}
+    for clash in index.clashes():
+        for course_id, other_id in (
+            (clash.course_id, clash.other_course_id),
+            (clash.other_course_id, clash.course_id),
+        ):
+            if course_id > 0:
+                continue
+            other = f"row {-other_id}" if other_id < 0 else f"course {other_id}"
+            errors.setdefault(-course_id, []).append(
+                f"The {RESOURCE_LABELS[clash.resource]} is already booked on "
+                f"{clash.day} by {other}"
+            )
+    if errors:
+        raise TimetableImportError(
+            [{"row": row, "errors": errors[row]} for row in sorted(errors)]
+        )
+
+
+def import_timetable(file: IO, file_format: str) -> dict:
+    """
+    Import a timetable file, creating its new courses and updating the ones that
+    already exist in bulk. The alerts of the new courses are created in a single
+    batch once the import is committed, instead of once per course.
+
+    Returns:
+    dict: The number of courses created and updated
+
+    Raises:
+    TimetableImportError: If the file is invalid, nothing is imported then
+    """
+    frame = validate_timetable(read_timetable(file, file_format))
+    records = get_records(frame)
+    codes = set(frame["code"].unique().tolist())
+    levels = set(frame["level"].unique().tolist())
+    keys = set(frame[list(NATURAL_KEY)].itertuples(index=False, name=None))
+
+    courses = [Course(**record) for record in records]
+    with transaction.atomic():
+        # The courses being replaced are locked until the import is committed, so
+        # that a concurrent import can't change which ones exist in between
+        existing = (
+            Course.objects.select_for_update()
+            .filter(code__in=codes)
+            .values_list("pk", "level", *NATURAL_KEY)
+        )
+        existing_ids: dict[tuple, int] = {}
+        for pk, level, *key in existing:
+            if tuple(key) in keys:
+                existing_ids[tuple(key)] = pk
+                # Courses moved to another level leave its timetable
+                levels.add(level)
+        check_clashes(frame, records, existing_ids)
+
+        Course.objects.bulk_create(
+            courses,
+            batch_size=IMPORT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=list(NATURAL_KEY),
+            update_fields=UPDATE_FIELDS,
+        )
+        transaction.on_commit(lambda: sync_imported_courses(levels, codes))
+
+    return {"created": len(courses) - len(existing_ids), "updated": len(existing_ids)}
+
+
+def sync_imported_courses(levels: set[int], codes: set[str]):
+    """
+    Create the alerts of the imported courses and refresh the timetables of their
+    levels. The schedule of the alerts of updated courses is unchanged, as their
+    day and start time identify them.
+    """
+    from alarm.models import Alert
+
+    Alert.objects.create_for_courses(Course.objects.filter(code__in=codes))
+    invalidate_timetable(*levels)
+
+
+def export_rows(courses: models.QuerySet) -> Iterator[tuple]:
+    day_order = models.Case(
+        *[
+            models.When(day=day, then=models.Value(index))
+            for index, day in enumerate(DayOfWeek.values)
+        ],
+        output_field=models.IntegerField(),
+    )
+    yield COLUMNS
+    yield from courses.order_by("level", day_order, "start_time", "code").values_list(
+        "code",
+        "name",
+        "level",
+        "day",
+        "venue",
+        "start_time",
+        "end_time",
+        "lecturer__email",
+    ).iterator(chunk_size=2000)
+
+
+class Echo:
+    """
+    File-like object returning what is written to it, to stream a CSV writer
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def export_timetable_csv(courses: models.QuerySet) -> Iterator[str]:
+    """
+    Stream the courses as the lines of a timetable CSV file
+    """
+    writer = csv.writer(Echo())
+    for row in export_rows(courses):
+        yield writer.writerow(row)
+
+
+def export_timetable_xlsx(courses: models.QuerySet) -> bytes:
+    """
+    Write the courses to a timetable XLSX file, a row at a time
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Timetable")
+    for row in export_rows(courses):
+        sheet.append(row)
+    output = BytesIO()
+    workbook.save(output)
+    return output.getvalue()
@@ -1,3 +1,409 @@
+import os
+import random
+from io import BytesIO
+import time as timer
+from datetime import time
+from itertools import combinations
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from authentication.testing import log_in
+from alarm.models import Alert
+from .clashes import CLASH_RESOURCES, TimetableIndex
+
+from .cache import get_timetable_validators, get_weekly_timetable, invalidate_timetable
+from .models import Course, CourseTag, Tag
+from .spreadsheets import TimetableImportError, import_timetable
+from .timetable import apply_special_courses, build_weekly_timetable
+
+User = get_user_model()
+
+
+def create_course(lecturer, code: str, level: int, day: str, hour: int) -> Course:
+    return Course.objects.create(
+        name=f"Course {code}",
+        code=code,
+        level=level,
+        lecturer=lecturer,
+        day=day,
+        venue=f"Room {code}",
+        start_time=time(hour, 0),
+        end_time=time(hour + 1, 0),
+    )
+
+
+def random_timetable(count: int, seed: int = 0) -> list[dict]:
+    """
+    Build a random timetable of course rows as indexed by TimetableIndex
+    """
+    rng = random.Random(seed)
+    courses = []
+    for course_id in range(1, count + 1):
+        start = rng.randrange(8 * 60, 18 * 60, 30)
+        end = start + rng.choice((60, 90, 120))
+        courses.append(
+            {
+                "id": course_id,
+                "code": f"ABC{course_id}",
+                "day": rng.choice(("MON", "TUE", "WED", "THU", "FRI")),
+                "start_time": time(start // 60, start % 60),
+                "end_time": time(end // 60, end % 60),
+                "venue": f"Room {rng.randrange(count // 10 or 1)}",
+                "lecturer_id": rng.randrange(count // 5 or 1),
+                "level": rng.choice((100, 200, 300, 400, 500)),
+            }
+        )
+    return courses
+
+
+def brute_force_clashes(courses: list[dict]) -> set[tuple]:
+    return {
+        (resource, first[resource], first["day"], *sorted((first["id"], second["id"])))
+        for first, second in combinations(courses, 2)
+        for resource in CLASH_RESOURCES
+        if first[resource] == second[resource]
+        and first["day"] == second["day"]
+        and first["start_time"] < second["end_time"]
+        and second["start_time"] < first["end_time"]
+    }
+
+
+def index_clashes(index: TimetableIndex) -> set[tuple]:
+    return {
+        (clash.resource, clash.value, clash.day, *sorted(clash[3:]))
+        for clash in index.clashes()
+    }
+
+
+def course_ids_by_day(timetable: list[dict]) -> dict[str, list[int]]:
+    return {
+        day["day"][0]: [course["id"] for course in day["courses"]]
+        for day in timetable
+        if day["courses"]
+    }
+
+
+class WeeklyTimetableTests(TestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create(
+            email="lecturer@example.com", is_lecturer=True
+        )
+        self.student = User.objects.create(
+            email="student@example.com", matric_number="ABC/01/0001", level=100
+        )
+        self.monday = create_course(self.lecturer, "ABC101", 100, "MON", 9)
+        self.tuesday = create_course(self.lecturer, "ABC102", 100, "TUE", 9)
+        self.spilled_over = create_course(self.lecturer, "ABC201", 200, "MON", 11)
+
+    def test_build_runs_constant_queries(self):
+        # The courses with their lecturers and their assistants
+        with self.assertNumQueries(2):
+            build_weekly_timetable(100)
+        for index in range(10):
+            create_course(self.lecturer, f"XYZ1{index:02}", 100, "WED", 8 + index)
+        with self.assertNumQueries(2):
+            timetable = build_weekly_timetable(100)
+        self.assertEqual(len(course_ids_by_day(timetable)["WED"]), 10)
+
+    def test_carried_over_courses_in_one_query(self):
+        timetable = build_weekly_timetable(100)
+        CourseTag.objects.tag(self.student, [self.monday.pk], Tag.CARRY_OVER)
+
+        # Only the tags of the student are loaded, the timetable is adjusted in Python
+        with self.assertNumQueries(1):
+            adjusted = apply_special_courses(timetable, self.student)
+        self.assertEqual(course_ids_by_day(adjusted), {"TUE": [self.tuesday.pk]})
+
+    def test_spilled_over_courses_bucketed_by_day(self):
+        timetable = build_weekly_timetable(100)
+        CourseTag.objects.tag(self.student, [self.spilled_over.pk], Tag.SPILL_OVER)
+
+        # The tags, then the spilled over courses with their lecturers and assistants
+        with self.assertNumQueries(3):
+            adjusted = apply_special_courses(timetable, self.student)
+        self.assertEqual(
+            course_ids_by_day(adjusted),
+            {
+                "MON": [self.monday.pk, self.spilled_over.pk],
+                "TUE": [self.tuesday.pk],
+            },
+        )
+
+    def test_no_special_courses(self):
+        timetable = build_weekly_timetable(100)
+        with self.assertNumQueries(0):
+            self.assertIs(apply_special_courses(timetable, self.student, {}), timetable)
+
+
+class ChangedFieldsTests(TestCase):
+    def setUp(self):
+        lecturer = User.objects.create(email="lecturer@example.com", is_lecturer=True)
+        create_course(lecturer, "ABC101", 100, "MON", 9)
+
+    def test_deferred_fields_unchanged(self):
+        course = Course.objects.only("id", "name", "start_time", "end_time").get()
+        # Deferred fields aren't loaded to be compared
+        with self.assertNumQueries(0):
+            self.assertEqual(course.get_changed_fields(), set())
+            course.name = "Renamed"
+            self.assertEqual(course.get_changed_fields(), {"name"})
+
+    def test_saving_deferred_course_loads_nothing(self):
+        course = Course.objects.only(
+            "id", "name", "level", "start_time", "end_time"
+        ).get()
+        course.name = "Renamed"
+        # Only the update, the deferred fields are neither loaded nor rescheduled
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks() as callbacks:
+            course.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(
+            course.get_deferred_fields(),
+            {"code", "day", "venue", "lecturer_id", "created_at", "updated_at"},
+        )
+        self.assertEqual(course.get_changed_fields(), set())
+
+
+class TimetableCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.lecturer = User.objects.create(
+            email="lecturer@example.com", is_lecturer=True
+        )
+        self.course = create_course(self.lecturer, "ABC101", 100, "MON", 9)
+
+    def test_body_matches_etag_version(self):
+        etag, _, version = get_timetable_validators(100)
+        timetable = get_weekly_timetable(100, version)
+
+        # A write after the validators were read doesn't change the body served
+        # under them
+        create_course(self.lecturer, "ABC102", 100, "TUE", 9)
+        invalidate_timetable(100)
+        self.assertEqual(get_weekly_timetable(100, version), timetable)
+
+        new_etag, _, new_version = get_timetable_validators(100)
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(
+            course_ids_by_day(get_weekly_timetable(100, new_version)),
+            {"MON": [self.course.pk], "TUE": [Course.objects.get(code="ABC102").pk]},
+        )
+
+    def test_lecturer_change_invalidates(self):
+        assistant = User.objects.create(email="assistant@example.com", is_lecturer=True)
+        other = create_course(assistant, "XYZ201", 200, "MON", 9)
+        self.course.assistants.add(assistant)
+        etags = {level: get_timetable_validators(level)[0] for level in (100, 200)}
+
+        # Logging in changes nothing the timetables show
+        with self.captureOnCommitCallbacks(execute=True):
+            assistant.save(update_fields=["last_login"])
+        self.assertEqual(get_timetable_validators(100)[0], etags[100])
+
+        assistant.email = "assistant@example.org"
+        with self.captureOnCommitCallbacks(execute=True):
+            assistant.save()
+        self.assertNotEqual(get_timetable_validators(100)[0], etags[100])
+        self.assertNotEqual(get_timetable_validators(other.level)[0], etags[200])
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN output is Postgres specific")
+class HotQueryPlanTests(TestCase):
+    """
+    The hot course queries must be served by an index. Sequential scans are disabled
+    so that the planner only falls back to one when no index applies, whatever the
+    size of the test tables.
+    """
+
+    def setUp(self):
+        self.lecturer = User.objects.create(
+            email="lecturer@example.com", is_lecturer=True
+        )
+        self.student = User.objects.create(
+            email="student@example.com", matric_number="ABC/01/0001", level=100
+        )
+        self.course = create_course(self.lecturer, "ABC101", 100, "MON", 9)
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assert_uses_index(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan, plan)
+
+    def test_level_timetable(self):
+        self.assert_uses_index(Course.objects.filter(level=100))
+        self.assert_uses_index(Course.objects.filter(level=100, day="MON"))
+
+    def test_lecturer_courses(self):
+        self.assert_uses_index(Course.objects.filter(lecturer=self.lecturer))
+
+    def test_slot_lookups(self):
+        self.assert_uses_index(
+            Course.objects.filter(
+                venue="Room ABC101", day="MON", start_time__lt=time(10, 0)
+            )
+        )
+        self.assert_uses_index(Course.objects.filter(code="ABC101"))
+
+    def test_course_list_page(self):
+        self.assert_uses_index(Course.objects.order_by("name", "id")[:20])
+
+    def test_course_tags(self):
+        self.assert_uses_index(CourseTag.objects.filter(student=self.student))
+        self.assert_uses_index(
+            CourseTag.objects.filter(course=self.course, tag=Tag.CARRY_OVER)
+        )
+
+
+class TimetableIndexTests(TestCase):
+    def test_clashes_match_brute_force(self):
+        courses = random_timetable(300)
+        index = TimetableIndex(courses)
+        self.assertEqual(index_clashes(index), brute_force_clashes(courses))
+        self.assertEqual(len(index.clashes()), len(index_clashes(index)))
+
+    def test_lookups_match_brute_force(self):
+        courses = random_timetable(300)
+        index = TimetableIndex(courses)
+        clashes = brute_force_clashes(courses)
+        for course in courses[:50]:
+            self.assertEqual(
+                {
+                    (clash.resource, *sorted(clash[3:]))
+                    for clash in index.find_clashes(course)
+                },
+                {
+                    (resource, first, second)
+                    for resource, _, _, first, second in clashes
+                    if course["id"] in (first, second)
+                },
+            )
+
+    @skipUnless(os.environ.get("RUN_BENCHMARKS"), "Set RUN_BENCHMARKS to run")
+    def test_benchmark(self):
+        courses = random_timetable(10_000)
+        start = timer.perf_counter()
+        index = TimetableIndex(courses)
+        built = timer.perf_counter()
+        clashes = index.clashes()
+        swept = timer.perf_counter()
+        for course in courses[:1000]:
+            index.find_clashes(course)
+        looked_up = timer.perf_counter()
+        print(
+            f"\n{len(courses)} courses: index built in {built - start:.3f}s, "
+            f"{len(clashes)} clashes swept in {swept - built:.3f}s, "
+            f"1000 lookups in {looked_up - swept:.3f}s"
+        )
+
+        subset = courses[:1500]
+        start = timer.perf_counter()
+        expected = brute_force_clashes(subset)
+        brute_forced = timer.perf_counter()
+        self.assertEqual(index_clashes(TimetableIndex(subset)), expected)
+        print(
+            f"brute force over {len(subset)} courses in " f"{brute_forced - start:.3f}s"
+        )
+
+
+class ClashReportTests(TestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create(
+            email="lecturer@example.com", is_lecturer=True
+        )
+        # Three courses of the same level at the same time clash pairwise
+        for index in range(3):
+            create_course(self.lecturer, f"ABC10{index}", 100, "MON", 9)
+        self.client = APIClient()
+        log_in(self.client, self.lecturer)
+
+    def test_paginated(self):
+        response = self.client.get("/api/courses/clashes", {"page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        # The courses share their lecturer and level
+        self.assertEqual(response.data["count"], 6)
+        self.assertEqual(len(response.data["results"]), 2)
+
+        pages = [response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            pages.append(response.data["results"])
+        clashes = [
+            (clash["resource"], clash["course"]["id"], clash["other_course"]["id"])
+            for page in pages
+            for clash in page
+        ]
+        self.assertEqual(len(set(clashes)), 6)
+
+
+class ImportTimetableTests(TestCase):
+    HEADER = "code,name,level,day,venue,start_time,end_time,lecturer\n"
+
+    def setUp(self):
+        self.lecturer = User.objects.create(
+            email="lecturer@example.com", is_lecturer=True
+        )
+
+    def import_rows(self, *rows: str) -> dict:
+        csv = self.HEADER + "".join(f"{row}\n" for row in rows)
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_timetable(BytesIO(csv.encode()), "csv")
+
+    def test_created_and_updated(self):
+        row = "ABC101,Intro,100,MON,Room 1,09:00,10:00,lecturer@example.com"
+        self.assertEqual(self.import_rows(row), {"created": 1, "updated": 0})
+        result = self.import_rows(
+            row.replace("Intro", "Introduction"),
+            "ABC102,Basics,100,TUE,Room 1,09:00,10:00,lecturer@example.com",
+        )
+        self.assertEqual(result, {"created": 1, "updated": 1})
+        self.assertEqual(
+            Course.objects.get(code="ABC101", day="MON").name, "Introduction"
+        )
+        self.assertEqual(
+            set(Alert.objects.values_list("event__code", flat=True)),
+            {"ABC101", "ABC102"},
+        )
+
+    def test_clashes_with_stored_courses(self):
+        other_lecturer = User.objects.create(
+            email="other@example.com", is_lecturer=True
+        )
+        stored = create_course(other_lecturer, "XYZ201", 200, "MON", 9)
+        # Another day, or another venue, lecturer and level, doesn't clash
+        create_course(other_lecturer, "XYZ202", 200, "TUE", 9)
+        with self.assertRaises(TimetableImportError) as raised:
+            self.import_rows(
+                f"ABC101,Intro,100,MON,{stored.venue},09:30,10:30,lecturer@example.com",
+                "ABC102,Basics,100,TUE,Room 1,09:00,10:00,lecturer@example.com",
+            )
+        self.assertEqual(
+            raised.exception.errors,
+            [
+                {
+                    "row": 2,
+                    "errors": [
+                        f"The venue is already booked on MON by course {stored.pk}"
+                    ],
+                }
+            ],
+        )
+        self.assertFalse(Course.objects.filter(code__startswith="ABC").exists())
 
-# Create your tests here.
+    def test_malformed_files(self):
+        files = [
+            (b'code,name\n"ABC101,Intro\n', "csv"),
+            (b"", "csv"),
+            (b"not a workbook", "xlsx"),
+            (b"PK\x03\x04 truncated", "xlsx"),
+        ]
+        for content, file_format in files:
+            with self.subTest(file_format=file_format, content=content):
+                with self.assertRaises(TimetableImportError) as raised:
+                    import_timetable(BytesIO(content), file_format)
+                self.assertIsNone(raised.exception.errors[0]["row"])
@@ -0,0 +1,93 @@
+from django.db import models
+
+from .models import COURSE_ORDERING, Course, CourseTag, DayOfWeek, Tag
+from .serializers import CourseForTheWeekSerializer, CourseSerializer, DayCourses
+
+
+def with_timetable_relations(courses: models.QuerySet) -> models.QuerySet:
+    """
+    Load the lecturer and assistants serialized with the courses of a timetable
+    along with them
+    """
+    return courses.select_related("lecturer").prefetch_related("assistants")
+
+
+def build_weekly_timetable(level: int) -> list[dict]:
+    """
+    Build the serialized courses of each day of the week for a level, loading all
+    the courses of the level at once and bucketing them by day in Python
+    """
+    courses_by_day: dict[str, list[Course]] = {day: [] for day in DayOfWeek.values}
+    courses = Course.objects.filter(level=level).order_by(*COURSE_ORDERING)
+    for course in with_timetable_relations(courses):
+        courses_by_day[course.day].append(course)
+
+    data = [
+        DayCourses(day=day, courses=courses_by_day[day[0]]) for day in DayOfWeek.choices
+    ]
+    return list(CourseForTheWeekSerializer(data, many=True).data)
+
+
+def timetable_sort_key(course: dict) -> tuple:
+    return course["name"], course["code"], course["level"], course["start_time"]
+
+
+def get_special_courses(student) -> dict[int, tuple[str, int]]:
+    """
+    Get the tag and level of the special courses of a student, by course ID
+    """
+    return {
+        course_id: (tag, level)
+        for course_id, tag, level in CourseTag.objects.filter(
+            student_id=student.pk
+        ).values_list("course_id", "tag", "course__level")
+    }
+
+
+def apply_special_courses(
+    timetable: list[dict],
+    student,
+    special_courses: dict[int, tuple[str, int]] | None = None,
+) -> list[dict]:
+    """
+    Adjust the weekly timetable of the level of a student to their special courses:
+    the courses they carry over are removed and the ones they spill over to added
+
+    Args:
+    timetable (list[dict]): The serialized weekly timetable of the level
+    student (User): The student the timetable is for
+    special_courses (dict): The special courses of the student, if already loaded
+
+    Returns:
+    list[dict]: The weekly timetable of the student
+    """
+    if special_courses is None:
+        special_courses = get_special_courses(student)
+    carried_over: set[int] = set()
+    spilled_over: set[int] = set()
+    for course_id, (tag, _) in special_courses.items():
+        if tag == Tag.CARRY_OVER:
+            carried_over.add(course_id)
+        elif tag == Tag.SPILL_OVER:
+            spilled_over.add(course_id)
+    if not carried_over and not spilled_over:
+        return timetable
+
+    spilled_over_by_day: dict[str, list[dict]] = {}
+    if spilled_over:
+        courses = with_timetable_relations(
+            Course.objects.filter(pk__in=spilled_over).exclude(level=student.level)
+        )
+        for course in CourseSerializer(courses, many=True).data:
+            spilled_over_by_day.setdefault(course["day"], []).append(course)
+
+    adjusted = []
+    for day in timetable:
+        courses = [
+            course for course in day["courses"] if course["id"] not in carried_over
+        ]
+        extra_courses = spilled_over_by_day.get(day["day"][0])
+        if extra_courses:
+            courses = sorted(courses + extra_courses, key=timetable_sort_key)
+        adjusted.append({**day, "courses": courses})
+    return adjusted
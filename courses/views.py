@@ -7,12 +7,31 @@ from drf_spectacular.utils import (
     extend_schema_view,
 )
 
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django_filters.rest_framework import DjangoFilterBackend
+
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 
-from .models import Course, DayOfWeek, SpecialCourse, Tag, Level
+from .cache import (
+    get_timetable_stamps,
+    get_timetable_validators,
+    get_weekly_timetable,
+)
+from .clashes import RESOURCE_LABELS, TimetableIndex
+from .filters import CourseFilter
+from .models import COURSE_ORDERING, Course, CourseTag, Tag, Level
+from .pagination import ClashPagination, CoursePagination
+from .timetable import (
+    apply_special_courses,
+    get_special_courses,
+    with_timetable_relations,
+)
 from authentication.permissions import (
     IsLecturer,
     IsStudent,
@@ -25,20 +44,63 @@ from .serializers import (
     CourseSerializer,
     AssistantUpdateSerializer,
     CourseForTheWeekSerializer,
-    DayCourses,
     SpecialCourseSerializer,
+    CourseIDsSerializer,
+    CourseTagsSerializer,
+    CourseTagResultSerializer,
+    ClashSerializer,
+    TimetableImportSerializer,
+    TimetableImportResultSerializer,
 )
 
 
+def conditional_response(request, etag: str, last_modified, build) -> Response:
+    """
+    Answer a read with 304 Not Modified if the client's copy is current, else with
+    the data returned by `build`, so that the data is only built when needed.
+    Clients must revalidate their copy on each use, as it is private to the user.
+
+    Args:
+    etag (str): The ETag of the data, unquoted
+    last_modified (datetime): The time the data was last modified
+    build (Callable[[], Any]): Builds the data of the response
+    """
+    etag = quote_etag(etag)
+    last_modified = int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = Response(build(), status=status.HTTP_200_OK)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 # Create your views here.
 @extend_schema_view(
     list=extend_schema(
         summary="Lists all courses in the database",
-        description="Lists all courses in the database. This action can only be performed by a lecturer or an admin",
+        description="Lists all courses in the database, a page at a time. This action can only be performed by a lecturer or an admin",
+        parameters=[
+            OpenApiParameter(
+                name="fields",
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="Comma separated fields to include for each course, e.g. id,code,name",
+            )
+        ],
     ),
     retrieve=extend_schema(
         summary="Retrieve a course by its ID",
         description="Retrieve a course by its ID. This action can only be performed by a lecturer or an admin",
+        parameters=[
+            OpenApiParameter(
+                name="fields",
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="Comma separated fields to include, e.g. id,code,name",
+            )
+        ],
     ),
     create=extend_schema(
         summary="Create a course",
@@ -62,6 +124,9 @@ class CourseViewSet(viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CoursePagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = CourseFilter
 
     def get_permissions(self):
         if self.action in [
@@ -69,11 +134,26 @@ class CourseViewSet(viewsets.ModelViewSet):
             "retrieve",
             "add_assistant",
             "remove_assistant",
+            "clashes",
+            "export_timetable",
         ]:
             self.permission_classes = [IsLecturer | IsAdmin | IsRegistrationOfficer]
-        if self.action in ["create", "update", "partial_update", "destroy"]:
+        if self.action in [
+            "create",
+            "update",
+            "partial_update",
+            "destroy",
+            "import_timetable",
+        ]:
             self.permission_classes = [IsRegistrationOfficer | IsAdmin]
-        if self.action in ["get_my_courses_for_the_week", "tag"]:
+        if self.action in [
+            "get_my_courses_for_the_week",
+            "get_my_courses",
+            "tag",
+            "untag",
+            "bulk_tag",
+            "bulk_untag",
+        ]:
             return [IsStudent()]
         if self.action == "get_courses_by_level":
             self.permission_classes = [IsLecturer | IsAdmin | IsStudent]
@@ -88,12 +168,43 @@ class CourseViewSet(viewsets.ModelViewSet):
             return CourseForTheWeekSerializer
         if self.action == "tag":
             return SpecialCourseSerializer
+        if self.action == "bulk_tag":
+            return CourseTagsSerializer
+        if self.action == "bulk_untag":
+            return CourseIDsSerializer
+        if self.action == "clashes":
+            return ClashSerializer
+        if self.action == "import_timetable":
+            return TimetableImportSerializer
         return super().get_serializer_class()
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    def get_sparse_fields(self) -> list[str] | None:
+        """
+        Get the fields requested with the `fields` query parameter, if any
+        """
+        if self.action not in ["list", "retrieve"]:
+            return None
+        fields = self.request.query_params.get("fields")
+        if not fields:
+            return None
+        return [field.strip() for field in fields.split(",") if field.strip()]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ["list", "retrieve"]:
+            # Only load the related users that are serialized
+            fields = self.get_sparse_fields()
+            if fields is None or "lecturer" in fields:
+                queryset = queryset.select_related("lecturer")
+            if fields is None or "assistants" in fields:
+                queryset = queryset.prefetch_related("assistants")
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs["fields"] = fields
+        return super().get_serializer(*args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
@@ -179,14 +290,141 @@ class CourseViewSet(viewsets.ModelViewSet):
         user: User = request.user
         student_level: int = user.level
 
-        # Student courses are all courses with the same level as the student
-        courses = Course.objects.filter(level=student_level)
+        # Student courses are all courses with the same level as the student, the
+        # timetable is shared by the students of the level so it is cached. Only
+        # the special courses of the student are looked up on each request, and
+        # the timetable isn't even read when the client's copy is current. The
+        # version is read once, so the body is the one the ETag stands for.
+        special_courses = get_special_courses(user)
+        etag, last_modified, version = get_timetable_validators(
+            student_level, special_courses, student=user.pk
+        )
+        return conditional_response(
+            request,
+            etag,
+            last_modified,
+            lambda: apply_special_courses(
+                get_weekly_timetable(student_level, version), user, special_courses
+            ),
+        )
+
+    @extend_schema(
+        summary="Report the clashes of the timetable",
+        description="Report every pair of courses double-booking a venue, a lecturer or a level, a page at a time. The timetable can be narrowed down with the course list filters. This action can only be performed by a lecturer or an admin",
+        responses=ClashSerializer(many=True),
+    )
+    @action(detail=False, methods=["GET"], pagination_class=ClashPagination)
+    def clashes(self, request):
+        # Indexing the courses in a stable order keeps the order of the clashes, and
+        # so the pages, stable
+        index = TimetableIndex.from_queryset(
+            self.filter_queryset(Course.objects.order_by("pk"))
+        )
+
+        def describe_course(course_id: int) -> dict:
+            course = index.courses[course_id]
+            return {
+                "id": course_id,
+                "code": course["code"],
+                "start_time": course["start_time"],
+                "end_time": course["end_time"],
+            }
+
         data = [
-            DayCourses(day=day, courses=courses.filter(day=day[0]))
-            for day in DayOfWeek.choices
+            {
+                "resource": RESOURCE_LABELS[clash.resource],
+                "value": clash.value,
+                "day": clash.day,
+                "course": describe_course(clash.course_id),
+                "other_course": describe_course(clash.other_course_id),
+            }
+            for clash in self.paginate_queryset(index.clashes())
         ]
-        serializer = CourseForTheWeekSerializer(data, many=True)
-        return Response(serializer.data)
+        return self.get_paginated_response(ClashSerializer(data, many=True).data)
+
+    @extend_schema(
+        summary="Import a timetable",
+        description="Import the courses of a CSV or XLSX timetable with the columns code, name, level, day, venue, start_time, end_time and lecturer (email). Courses are identified by their code, day and start time, existing ones are updated. Nothing is imported if any row is invalid or clashes. This action can only be performed by a registration officer or an admin",
+        request={"multipart/form-data": TimetableImportSerializer},
+        responses={
+            status.HTTP_200_OK: TimetableImportResultSerializer,
+            status.HTTP_400_BAD_REQUEST: inline_serializer(
+                "TimetableImport400",
+                {
+                    "error": serializers.CharField(),
+                    "rows": serializers.ListField(child=serializers.DictField()),
+                },
+            ),
+        },
+    )
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="import",
+        parser_classes=[MultiPartParser],
+    )
+    def import_timetable(self, request):
+        from .spreadsheets import (
+            TimetableImportError,
+            get_file_format,
+            import_timetable,
+        )
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file = serializer.validated_data["file"]
+        try:
+            file_format = get_file_format(
+                file.name, serializer.validated_data.get("file_format")
+            )
+            result = import_timetable(file, file_format)
+        except TimetableImportError as e:
+            return Response(
+                {"error": str(e), "rows": e.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            TimetableImportResultSerializer(result).data, status=status.HTTP_200_OK
+        )
+
+    @extend_schema(
+        summary="Export the timetable",
+        description="Export the courses, narrowed down with the course list filters, as a CSV (streamed) or XLSX timetable that can be imported back. This action can only be performed by a lecturer or an admin",
+        parameters=[
+            OpenApiParameter(
+                name="file_format",
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="The format of the file, either 'csv' (default) or 'xlsx'",
+                enum=["csv", "xlsx"],
+            )
+        ],
+        responses={(200, "text/csv"): OpenApiTypes.BINARY},
+    )
+    @action(detail=False, methods=["GET"], url_path="export")
+    def export_timetable(self, request):
+        from .spreadsheets import export_timetable_csv, export_timetable_xlsx
+
+        courses = self.filter_queryset(Course.objects.all())
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format == "csv":
+            response = StreamingHttpResponse(
+                export_timetable_csv(courses), content_type="text/csv"
+            )
+        elif file_format == "xlsx":
+            response = HttpResponse(
+                export_timetable_xlsx(courses),
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+        else:
+            return Response(
+                {"error": "Invalid file_format value"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        response["Content-Disposition"] = (
+            f'attachment; filename="timetable.{file_format}"'
+        )
+        return response
 
     @extend_schema(
         description="Tag a course as special - carry over or spill over",
@@ -217,24 +455,73 @@ class CourseViewSet(viewsets.ModelViewSet):
             )
 
         course: Course = self.get_object()
-        student: User = request.user
+        serializer = CourseTagsSerializer(
+            data={"courses": [course.pk], "tag": tag}, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
 
-        # Check if the course is already tagged as special for the student
-        if SpecialCourse.objects.filter(base_course=course, students=student).exists():
-            return Response(
-                {"error": "Course already tagged"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        # Tagging a course again replaces its previous tag
+        CourseTag.objects.tag(request.user, [course.pk], tag)
+        course.tag = tag
+        serializer = SpecialCourseSerializer(course)
 
-        # Use get_or_create to handle the creation or retrieval in one step
-        special_course, created = SpecialCourse.objects.get_or_create(
-            base_course=course, tag=tag
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        description="Remove the carry over or spill over tag of a course",
+        summary="Remove the tag of a course for the logged in student",
+        request=OpenApiTypes.NONE,
+        responses=CourseTagResultSerializer,
+    )
+    @action(detail=True, methods=["POST"])
+    def untag(self, request, pk=None):
+        course: Course = self.get_object()
+        updated = CourseTag.objects.untag(request.user, [course.pk])
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        description="Tag several courses as carry over or spill over at once, replacing their previous tags",
+        summary="Tag several courses for the logged in student",
+        request=CourseTagsSerializer,
+        responses=CourseTagResultSerializer,
+    )
+    @action(detail=False, methods=["POST"], url_path="bulk-tag")
+    def bulk_tag(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = CourseTag.objects.tag(
+            request.user,
+            serializer.validated_data["courses"],
+            serializer.validated_data["tag"],
         )
-        if created or not special_course.students.filter(pk=student.pk).exists():
-            special_course.students.add(student)
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
 
-        serializer = SpecialCourseSerializer(special_course)
+    @extend_schema(
+        description="Remove the tags of several courses at once",
+        summary="Remove the tags of several courses for the logged in student",
+        request=CourseIDsSerializer,
+        responses=CourseTagResultSerializer,
+    )
+    @action(detail=False, methods=["POST"], url_path="bulk-untag")
+    def bulk_untag(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = CourseTag.objects.untag(
+            request.user, serializer.validated_data["courses"]
+        )
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    @extend_schema(
+        description="Get the effective courses of the logged in student: the courses of their level they don't carry over and the courses they spill over to, a page at a time",
+        summary="Get the courses of the logged in student",
+        responses=CourseSerializer(many=True),
+    )
+    @action(detail=False, methods=["GET"])
+    def get_my_courses(self, request):
+        courses = with_timetable_relations(Course.objects.for_student(request.user))
+        page = self.paginate_queryset(courses)
+        serializer = CourseSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @extend_schema(
         description="Get courses by level",
@@ -266,6 +553,13 @@ class CourseViewSet(viewsets.ModelViewSet):
                 {"error": "Invalid level value"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        courses = Course.objects.filter(level=level)
-        serializer = CourseSerializer(courses, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        version, last_modified = get_timetable_stamps(level)[level]
+        return conditional_response(
+            self.request,
+            f"{level}.{version}",
+            last_modified,
+            lambda: CourseSerializer(
+                Course.objects.filter(level=level).order_by(*COURSE_ORDERING),
+                many=True,
+            ).data,
+        )
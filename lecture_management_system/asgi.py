@@ -19,14 +19,17 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "lecture_management_system.settings")
 asgi_app = get_asgi_application()
 
-from chat.routing import websocket_urlpatterns
+from alarm.routing import websocket_urlpatterns as alarm_websocket_urlpatterns
+from chat.routing import websocket_urlpatterns as chat_websocket_urlpatterns
 from chat.middleware import SessionAuthMiddleware
 
 application = ProtocolTypeRouter(
     {
         "http": asgi_app,
         "websocket": AllowedHostsOriginValidator(
-            SessionAuthMiddleware(URLRouter(websocket_urlpatterns))
+            SessionAuthMiddleware(
+                URLRouter(chat_websocket_urlpatterns + alarm_websocket_urlpatterns)
+            )
         ),
     }
 )
@@ -99,25 +99,26 @@ ASGI_APPLICATION = "lecture_management_system.asgi.application"
 
 # Channels
 # https://channels.readthedocs.io/en/stable/
-CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
-# CHANNEL_LAYERS = {
-#     "default": {
-#         "BACKEND": "channels_redis.core.RedisChannelLayer",
-#         "CONFIG": {
-#             "hosts": [
-#                 (os.environ.get("REDIS_HOST"), int(os.environ.get("REDIS_PORT")))
-#             ],
-#         },
-#     },
-# }
-
-# if os.environ.get("REDIS_PASSWORD"):
-#     CHANNEL_LAYERS["default"]["CONFIG"]["password"] = os.environ.get("REDIS_PASSWORD")
+# The in-memory layer only reaches the consumers of its own process, so messages sent
+# from the workers (e.g. alert pushes) need a shared layer such as Redis
+CHANNEL_LAYERS_URL = os.environ.get("CHANNEL_LAYERS_URL")
+if CHANNEL_LAYERS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [CHANNEL_LAYERS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
 
 # Session
 # https://docs.djangoproject.com/en/5.1/topics/http/sessions/
 
-SESSION_ENGINE = "django.contrib.sessions.backends.db"
+# Sessions are read through the cache and written through to the database
+SESSION_ENGINE = os.environ.get(
+    "SESSION_ENGINE", "django.contrib.sessions.backends.cached_db"
+)
 SESSION_COOKIE_AGE = (
     int(os.environ.get("SESSION_COOKIE_AGE_DAYS", "7")) * 24 * 60 * 60
 )  # 7 days
@@ -126,6 +127,14 @@ SESSION_COOKIE_SAMESITE = os.environ.get(
     "SESSION_COOKIE_SAMESITE", "Lax"
 )  # Keep as string
 SESSION_COOKIE_HTTPONLY = str_to_bool(os.environ.get("SESSION_COOKIE_HTTPONLY", "True"))
+# Seconds the user of a session token stays cached in the shared cache, tokens are
+# invalidated on logout and when their user changes
+SESSION_TOKEN_CACHE_TIMEOUT = int(os.environ.get("SESSION_TOKEN_CACHE_TIMEOUT", "300"))
+# Seconds it stays cached in each process, which bounds how long a process may
+# keep accepting a token after it was invalidated
+SESSION_TOKEN_LOCAL_CACHE_TIMEOUT = float(
+    os.environ.get("SESSION_TOKEN_LOCAL_CACHE_TIMEOUT", "5")
+)
 
 # CSRF
 # https://docs.djangoproject.com/en/5.1/ref/csrf/
@@ -156,6 +165,23 @@ else:
         }
     }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+CACHE_URL = os.environ.get("CACHE_URL")
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -261,6 +287,74 @@ CELERY_RESULT_BACKEND = os.environ.get(
 )
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 
+# Alert Settings
+# Timezone the lecture times are expressed in
+CAMPUS_TIME_ZONE = os.environ.get("CAMPUS_TIME_ZONE", TIME_ZONE)
+# Maximum number of minutes of missed alerts to catch up on after an outage
+ALERT_MAX_CATCHUP_MINUTES = int(os.environ.get("ALERT_MAX_CATCHUP_MINUTES", "5"))
+# Maximum number of BCC recipients per alert email, kept below provider limits
+ALERT_EMAIL_BCC_CHUNK_SIZE = int(os.environ.get("ALERT_EMAIL_BCC_CHUNK_SIZE", "50"))
+# Channels alerts are delivered over. Each transport sends batches of up to
+# BATCH_SIZE recipients, at most CONCURRENCY at a time and RATE_LIMIT per second.
+ALERT_TRANSPORTS = {
+    "EMAIL": {
+        "BACKEND": "alarm.transports.EmailTransport",
+        "BATCH_SIZE": ALERT_EMAIL_BCC_CHUNK_SIZE,
+        "RATE_LIMIT": float(os.environ.get("ALERT_EMAIL_RATE_LIMIT", "10")),
+        # A single SMTP connection is shared by the deliveries of a worker
+        "CONCURRENCY": 1,
+    },
+}
+# Alerts are pushed from the workers, so pushes only reach the clients over a shared
+# channel layer. Without one they would be recorded as sent without being delivered.
+if CHANNEL_LAYERS_URL:
+    ALERT_TRANSPORTS["PUSH"] = {
+        "BACKEND": "alarm.transports.PushTransport",
+        "BATCH_SIZE": 500,
+        "CONCURRENCY": 10,
+    }
+if os.environ.get("ALERT_SMS_GATEWAY_URL"):
+    ALERT_TRANSPORTS["SMS"] = {
+        "BACKEND": "alarm.transports.HTTPSMSTransport",
+        "BATCH_SIZE": int(os.environ.get("ALERT_SMS_BATCH_SIZE", "100")),
+        "RATE_LIMIT": float(os.environ.get("ALERT_SMS_RATE_LIMIT", "5")),
+        "CONCURRENCY": int(os.environ.get("ALERT_SMS_CONCURRENCY", "4")),
+        "OPTIONS": {
+            "URL": os.environ.get("ALERT_SMS_GATEWAY_URL"),
+            "API_KEY": os.environ.get("ALERT_SMS_GATEWAY_API_KEY"),
+            "SENDER": os.environ.get("ALERT_SMS_SENDER"),
+        },
+    }
+# Number of recipient rows fetched at a time when resolving the recipients of a tick
+ALERT_RECIPIENT_QUERY_CHUNK_SIZE = int(
+    os.environ.get("ALERT_RECIPIENT_QUERY_CHUNK_SIZE", "2000")
+)
+# Retries of a failed chunk, with exponential backoff in seconds
+ALERT_DELIVERY_MAX_RETRIES = int(os.environ.get("ALERT_DELIVERY_MAX_RETRIES", "5"))
+ALERT_DELIVERY_RETRY_BACKOFF = int(os.environ.get("ALERT_DELIVERY_RETRY_BACKOFF", "5"))
+ALERT_DELIVERY_RETRY_BACKOFF_MAX = int(
+    os.environ.get("ALERT_DELIVERY_RETRY_BACKOFF_MAX", "300")
+)
+# Seconds between the checks of the alert scheduler for changed schedule entries,
+# and between its full reloads, which also drop the entries of deleted alerts
+ALERT_SCHEDULER_REFRESH_INTERVAL = float(
+    os.environ.get("ALERT_SCHEDULER_REFRESH_INTERVAL", "5")
+)
+ALERT_SCHEDULER_RELOAD_INTERVAL = float(
+    os.environ.get("ALERT_SCHEDULER_RELOAD_INTERVAL", "3600")
+)
+# Bearer token scrapers present to read the metrics endpoint, which is disabled
+# without one. Set PROMETHEUS_MULTIPROC_DIR to a directory shared by the web and
+# worker processes of a host for the metrics to cover every process.
+ALERT_METRICS_TOKEN = os.environ.get("ALERT_METRICS_TOKEN")
+
+# Course Settings
+# Seconds a weekly timetable stays cached. Timetables are invalidated whenever a
+# course or one of its lecturers changes, the timeout only evicts unused entries.
+COURSE_TIMETABLE_CACHE_TIMEOUT = int(
+    os.environ.get("COURSE_TIMETABLE_CACHE_TIMEOUT", str(24 * 60 * 60))
+)
+
 # Admin Settings
 ADMIN_SITE_HEADER = "Lecture Management System Administration"
 ADMIN_SITE_TITLE = "Lecture Management System"
@@ -55,6 +55,7 @@ urlpatterns = [
     path("", APIRootView.as_view(), name="api-root"),
     path("admin/", admin.site.urls),
     path("api/", include(router.urls)),
+    path("metrics", alarm_views.metrics_view, name="metrics"),
     # YOUR PATTERNS
     path("api/docs", SpectacularAPIView.as_view(), name="docs"),
     # Optional UI: